@@ -2,10 +2,45 @@ import os
 import json
 import tomllib as toml
 from tomli_w import dump as toml_dump
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from loguru import logger
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# Parsed JSON files keyed by path, valid while (st_mtime_ns, st_size) match
+_JSON_FILE_CACHE: Dict[str, Tuple[int, int, Any]] = {}
+
+
+def load_json_file_cached(path: str) -> Any:
+    """
+    Load a JSON file, reusing the parsed result while the file is unchanged.
+
+    The returned object is shared between callers and must not be mutated.
+
+    Args:
+        path: Path to the JSON file.
+
+    Returns:
+        The parsed JSON data.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+        json.JSONDecodeError: If the file is not valid JSON.
+    """
+    stat = os.stat(path)
+    cached = _JSON_FILE_CACHE.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(path, "rb") as f:
+        data = _json_loads(f.read())
+    _JSON_FILE_CACHE[path] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
 
 class ConfigManagement:
     """
@@ -278,6 +313,7 @@ class ConfigManagement:
             os.makedirs(os.path.dirname(config_path), exist_ok=True)
             with open(config_path, "w", encoding="utf-8") as f:
                 json.dump(config_data, f, indent=2)
+            _JSON_FILE_CACHE.pop(config_path, None)
             agent_manager = AgentManager.get_instance()
             agent_manager.context_shrink_enabled = config_data.get(
                 "global_settings", {}
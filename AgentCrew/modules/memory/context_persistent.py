@@ -471,20 +471,43 @@ class ContextPersistenceService:
             ValueError: If behavior format is invalid.
             IOError, TypeError, OSError: If reading or writing fails.
         """
+        return self.store_adaptive_behaviors(
+            agent_name, {behavior_id: behavior}, is_local
+        )
+
+    def store_adaptive_behaviors(
+        self, agent_name: str, behaviors: Dict[str, str], is_local=False
+    ) -> bool:
+        """
+        Stores or updates several adaptive behaviors for a specific agent
+        with a single read and write of the behaviors file.
+
+        Args:
+            agent_name: The name of the agent.
+            behaviors: Mapping of behavior IDs to "when...do..." descriptions.
+
+        Returns:
+            True if successful, False otherwise.
+
+        Raises:
+            ValueError: If any behavior format is invalid.
+            IOError, TypeError, OSError: If reading fails.
+        """
         # Validate behavior format
-        if not isinstance(behavior, str) or not behavior.strip():
-            raise ValueError("Behavior must be a non-empty string")
+        for behavior in behaviors.values():
+            if not isinstance(behavior, str) or not behavior.strip():
+                raise ValueError("Behavior must be a non-empty string")
 
-        behavior_lower = behavior.lower().strip()
-        if not behavior_lower.startswith("when"):
-            raise ValueError("Behavior must follow 'when..., [action]...' format")
+            behavior_lower = behavior.lower().strip()
+            if not behavior_lower.startswith("when"):
+                raise ValueError("Behavior must follow 'when..., [action]...' format")
 
-        adaptive_data = self._read_json_file(
+        file_path = (
             self.adaptive_behaviors_local_path
             if is_local
-            else self.adaptive_behaviors_file_path,
-            default_value={},
+            else self.adaptive_behaviors_file_path
         )
+        adaptive_data = self._read_json_file(file_path, default_value={})
 
         if not isinstance(adaptive_data, dict):
             logger.warning(
@@ -496,22 +519,19 @@ class ContextPersistenceService:
         if agent_name not in adaptive_data:
             adaptive_data[agent_name] = {}
 
-        # Store the behavior
-        adaptive_data[agent_name][behavior_id] = behavior.strip()
+        # Store the behaviors
+        agent_behaviors = adaptive_data[agent_name]
+        for behavior_id, behavior in behaviors.items():
+            agent_behaviors[behavior_id] = behavior.strip()
 
         try:
-            self._write_json_file(
-                self.adaptive_behaviors_local_path
-                if is_local
-                else self.adaptive_behaviors_file_path,
-                adaptive_data,
-            )
+            self._write_json_file(file_path, adaptive_data)
             logger.info(
-                f"INFO: Stored adaptive behavior '{behavior_id}' for agent '{agent_name}'"
+                f"INFO: Stored adaptive behaviors {list(behaviors)} for agent '{agent_name}'"
             )
             return True
         except Exception as e:
-            logger.error(f"ERROR: Failed to store adaptive behavior: {e}")
+            logger.error(f"ERROR: Failed to store adaptive behaviors: {e}")
             return False
 
     def remove_adaptive_behavior(
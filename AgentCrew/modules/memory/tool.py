@@ -1,10 +1,19 @@
-from typing import Dict, Any, Callable
+import sys
+from typing import Dict, Any, Callable, List, Optional
+from dataclasses import dataclass
 from datetime import datetime as dt
 
 from AgentCrew.modules.agents import AgentManager
 from .base_service import BaseMemoryService
 
 
+def _get_current_agent_name(default: str) -> str:
+    """Name of the agent currently selected in the manager, or ``default``."""
+    # Read the attribute directly; get_current_agent raises when unset
+    current_agent = AgentManager.get_instance().current_agent
+    return current_agent.name if current_agent is not None else default
+
+
 def get_memory_forget_tool_definition(provider="claude") -> Dict[str, Any]:
     """Optimized memory forgetting tool definition."""
 
@@ -56,8 +65,7 @@ def get_memory_forget_tool_handler(memory_service: BaseMemoryService) -> Callabl
         ids = params.get("ids", [])
 
         # Use provided agent_name or fallback to current agent
-        current_agent = AgentManager.get_instance().get_current_agent()
-        agent_name = current_agent.name if current_agent else "None"
+        agent_name = _get_current_agent_name("None")
 
         try:
             result = memory_service.forget_ids(ids, agent_name)
@@ -170,8 +178,7 @@ def get_memory_retrieve_tool_handler(memory_service: BaseMemoryService) -> Calla
             )
 
         # Use provided agent_name or fallback to current agent
-        current_agent = AgentManager.get_instance().get_current_agent()
-        agent_name = current_agent.name if current_agent else ""
+        agent_name = _get_current_agent_name("")
 
         try:
             if from_date:
@@ -256,8 +263,63 @@ All behaviors must follow 'when..., [action]...' format for automatic activation
         }
 
 
+_STORED_BEHAVIOR_TMPL = "Stored behavior '{behavior_id}': {behavior}"
+_INVALID_BEHAVIOR_TMPL = "Invalid format: {error}"
+_SINGLE_STEP_BEHAVIOR_TMPL = "when {condition}, do {step}"
+_MULTI_STEP_BEHAVIOR_TMPL = "when {condition}, do run following steps: {steps}"
+
+
+@dataclass(slots=True)
+class BehaviorValidationResult:
+    """Result of validating learn_behavior parameters."""
+
+    ok: bool
+    error_msg: Optional[str] = None
+    behavior: str = ""
+
+
+def _validate_behavior(
+    behavior_id: str, condition: str, action_steps: Any
+) -> BehaviorValidationResult:
+    """Validate behavior parameters and compose the 'when..., do...' string."""
+    if not behavior_id:
+        return BehaviorValidationResult(
+            False, "Behavior ID required (e.g., 'communication_style_technical')."
+        )
+    if not condition:
+        return BehaviorValidationResult(
+            False, "Condition required (e.g., 'user asks about debugging')."
+        )
+    if not action_steps or not isinstance(action_steps, list):
+        return BehaviorValidationResult(
+            False, "Action steps required as a non-empty list of strings."
+        )
+
+    steps = []
+    for step in action_steps:
+        if isinstance(step, str):
+            step = step.strip()
+            if step:
+                steps.append(step)
+    if not steps:
+        return BehaviorValidationResult(
+            False, "At least one valid action step is required."
+        )
+
+    # Single-step behaviors (the common case) skip numbering and joining
+    if len(steps) == 1:
+        behavior = _SINGLE_STEP_BEHAVIOR_TMPL.format(condition=condition, step=steps[0])
+    else:
+        behavior = _MULTI_STEP_BEHAVIOR_TMPL.format(
+            condition=condition,
+            steps="; ".join(f"{i}. {step}" for i, step in enumerate(steps, 1)),
+        )
+    return BehaviorValidationResult(True, behavior=behavior)
+
+
 def get_learn_behavior_tool_handler(persistence_service: Any) -> Callable:
     """Optimized adaptive behavior handler with concise feedback."""
+    store = persistence_service.store_adaptive_behavior
 
     def handle_learn_behavior(**params) -> str:
         behavior_id = params.get("id", "").strip()
@@ -265,55 +327,141 @@ def get_learn_behavior_tool_handler(persistence_service: Any) -> Callable:
         action_steps = params.get("action_steps", [])
         scope = params.get("scope", "global").strip().lower()
 
-        if not behavior_id:
-            return "Behavior ID required (e.g., 'communication_style_technical')."
-
-        if not condition:
-            return "Condition required (e.g., 'user asks about debugging')."
-
-        if (
-            not action_steps
-            or not isinstance(action_steps, list)
-            or len(action_steps) == 0
-        ):
-            return "Action steps required as a non-empty list of strings."
-
-        action_steps = [
-            step.strip()
-            for step in action_steps
-            if isinstance(step, str) and step.strip()
-        ]
-        if len(action_steps) == 0:
-            return "At least one valid action step is required."
-
-        if len(action_steps) == 1:
-            behavior = f"when {condition}, do {action_steps[0]}"
-        else:
-            steps_joined = "; ".join(
-                f"{i + 1}. {step}" for i, step in enumerate(action_steps)
-            )
-            behavior = f"when {condition}, do run following steps: {steps_joined}"
+        result = _validate_behavior(behavior_id, condition, action_steps)
+        if not result.ok:
+            return result.error_msg
+        behavior = result.behavior
 
-        current_agent = AgentManager.get_instance().get_current_agent()
-        agent_name = current_agent.name if current_agent else "default"
+        behavior_id = sys.intern(behavior_id)
+        agent_name = sys.intern(_get_current_agent_name("default"))
 
         try:
-            success = persistence_service.store_adaptive_behavior(
-                agent_name, behavior_id, behavior, scope == "project"
-            )
+            success = store(agent_name, behavior_id, behavior, scope == "project")
             return (
-                f"Stored behavior '{behavior_id}': {behavior}"
+                _STORED_BEHAVIOR_TMPL.format(behavior_id=behavior_id, behavior=behavior)
                 if success
                 else "Storage completed but may need verification."
             )
         except ValueError as e:
-            return f"Invalid format: {str(e)}"
+            return _INVALID_BEHAVIOR_TMPL.format(error=e)
         except Exception as e:
             return f"Storage failed: {str(e)}"
 
     return handle_learn_behavior
 
 
+def get_learn_behaviors_tool_definition(provider="claude") -> Dict[str, Any]:
+    """Batch variant of learn_behavior for storing several behaviors at once."""
+
+    tool_description = """Stores several behavioral patterns in one call, e.g. when importing a behavior profile or when the user states multiple preferences together.
+
+Each entry takes the same fields as learn_behavior. Behaviors sharing a scope are saved in a single write."""
+
+    behavior_schema = get_learn_behavior_tool_definition("claude")["input_schema"]
+    tool_arguments = {
+        "behaviors": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": behavior_schema["properties"],
+                "required": behavior_schema["required"],
+            },
+            "description": "Behaviors to store. If an ID appears more than once in the same scope, the last entry wins.",
+        },
+    }
+
+    tool_required = ["behaviors"]
+
+    if provider == "claude":
+        return {
+            "name": "learn_behaviors",
+            "description": tool_description,
+            "input_schema": {
+                "type": "object",
+                "properties": tool_arguments,
+                "required": tool_required,
+            },
+        }
+    else:  # provider == "groq"
+        return {
+            "type": "function",
+            "function": {
+                "name": "learn_behaviors",
+                "description": tool_description,
+                "parameters": {
+                    "type": "object",
+                    "properties": tool_arguments,
+                    "required": tool_required,
+                },
+            },
+        }
+
+
+def get_learn_behaviors_tool_handler(persistence_service: Any) -> Callable:
+    """Adaptive behavior handler storing many behaviors in one write per scope."""
+    store = persistence_service.store_adaptive_behaviors
+
+    def handle_learn_behaviors(**params) -> str:
+        items = params.get("behaviors", [])
+        if not items or not isinstance(items, list):
+            return "Behaviors required as a non-empty list."
+
+        messages: List[str] = [""] * len(items)
+        scoped: Dict[bool, Dict[str, str]] = {False: {}, True: {}}
+        # Index of the entry that currently owns each ID, per scope
+        owners: Dict[bool, Dict[str, int]] = {False: {}, True: {}}
+
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                messages[i] = "Each behavior must be an object."
+                continue
+            behavior_id = item.get("id", "").strip()
+            result = _validate_behavior(
+                behavior_id,
+                item.get("condition", "").strip(),
+                item.get("action_steps", []),
+            )
+            if not result.ok:
+                messages[i] = result.error_msg or ""
+                continue
+            is_local = item.get("scope", "global").strip().lower() == "project"
+            behavior_id = sys.intern(behavior_id)
+            previous = owners[is_local].get(behavior_id)
+            if previous is not None:
+                messages[previous] = (
+                    f"Skipped behavior '{behavior_id}': superseded by entry {i + 1}."
+                )
+            owners[is_local][behavior_id] = i
+            scoped[is_local][behavior_id] = result.behavior
+
+        agent_name = sys.intern(_get_current_agent_name("default"))
+
+        for is_local, behaviors in scoped.items():
+            if not behaviors:
+                continue
+            stored = owners[is_local]
+            try:
+                success = store(agent_name, behaviors, is_local)
+                for behavior_id, i in stored.items():
+                    messages[i] = (
+                        _STORED_BEHAVIOR_TMPL.format(
+                            behavior_id=behavior_id, behavior=behaviors[behavior_id]
+                        )
+                        if success
+                        else "Storage completed but may need verification."
+                    )
+            except ValueError as e:
+                for i in stored.values():
+                    messages[i] = _INVALID_BEHAVIOR_TMPL.format(error=e)
+            except Exception as e:
+                for i in stored.values():
+                    messages[i] = f"Storage failed: {str(e)}"
+
+        return "\n".join(f"{i}. {message}" for i, message in enumerate(messages, 1))
+
+    return handle_learn_behaviors
+
+
 def adaptive_instruction_prompt():
     """Concise adaptive behavior instructions for system prompt."""
     return """<Adaptive_Behaviors>
@@ -356,27 +504,37 @@ def register(
     agent=None,
 ):
     """Register optimized memory tools with comprehensive capabilities."""
-    from AgentCrew.modules.tools.registration import register_tool
-
-    # Register core memory management tools
-    register_tool(
-        get_memory_retrieve_tool_definition,
-        get_memory_retrieve_tool_handler,
-        service_instance,
-        agent,
-    )
-    register_tool(
-        get_memory_forget_tool_definition,
-        get_memory_forget_tool_handler,
-        service_instance,
-        agent,
-    )
-
-    # Register adaptive behavior tool if persistence service is available
+    from AgentCrew.modules.tools.registration import register_tools
+
+    # Core memory management tools
+    tools = [
+        (
+            get_memory_retrieve_tool_definition,
+            get_memory_retrieve_tool_handler,
+            service_instance,
+        ),
+        (
+            get_memory_forget_tool_definition,
+            get_memory_forget_tool_handler,
+            service_instance,
+        ),
+    ]
+
+    # Adaptive behavior tool if persistence service is available
     if persistence_service is not None:
-        register_tool(
-            get_learn_behavior_tool_definition,
-            get_learn_behavior_tool_handler,
-            persistence_service,
-            agent,
+        tools.append(
+            (
+                get_learn_behavior_tool_definition,
+                get_learn_behavior_tool_handler,
+                persistence_service,
+            )
         )
+        tools.append(
+            (
+                get_learn_behaviors_tool_definition,
+                get_learn_behaviors_tool_handler,
+                persistence_service,
+            )
+        )
+
+    register_tools(tools, agent)
@@ -18,3 +18,18 @@ def register_tool(definition_func, handler_factory, service_instance=None, agent
         # Register with the global registry
         registry = ToolRegistry.get_instance()
         registry.register_tool(definition_func, handler_factory, service_instance)
+
+
+def register_tools(items, agent=None):
+    """
+    Register several tools with the central registry or directly with an agent
+
+    Args:
+        items: Iterable of (definition_func, handler_factory, service_instance) tuples
+        agent: Agent instance to register the tools with directly (optional)
+    """
+    register = (
+        agent.register_tool if agent else ToolRegistry.get_instance().register_tool
+    )
+    for definition_func, handler_factory, service_instance in items:
+        register(definition_func, handler_factory, service_instance)
@@ -1,10 +1,18 @@
 import os
+import asyncio
+import hashlib
 import tempfile
 import threading
-from typing import Dict, Any, Optional, Callable
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import Dict, Any, List, Optional, Callable
+from io import BytesIO
 import queue
+import numpy as np
 import soundfile as sf
-from openai import OpenAI
+from scipy import signal
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 from pathlib import Path
 import subprocess
 import platform
@@ -14,6 +22,27 @@ from .base import BaseVoiceService
 
 from loguru import logger
 
+WHISPER_SAMPLE_RATE = 16000
+STT_CACHE_SIZE = 128
+MIN_SPEECH_SECONDS = 0.2
+SILENCE_RMS_THRESHOLD = 1e-3
+# Long recordings are transcribed in chunks cut at the quietest point found
+# in the last few seconds before each chunk limit
+STT_CHUNK_SECONDS = 30
+SILENCE_SEARCH_SECONDS = 5
+SILENCE_FRAME_SECONDS = 0.03
+JSON_TRANSCRIPTION_OPTIONS: Dict[str, Any] = {"response_format": "json"}
+VERBOSE_TRANSCRIPTION_OPTIONS: Dict[str, Any] = {
+    "response_format": "verbose_json",
+    "timestamp_granularities": ["segment"],
+}
+HTTP_LIMITS = httpx.Limits(
+    max_keepalive_connections=32, max_connections=64, keepalive_expiry=60.0
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+# How long stop_tts_thread waits for the worker to finish its current clip
+TTS_STOP_TIMEOUT = 2.0
+
 
 class DeepInfraVoiceService(BaseVoiceService):
     """Service for DeepInfra voice interactions using OpenAI-compatible API."""
@@ -30,10 +59,24 @@ class DeepInfraVoiceService(BaseVoiceService):
                 "DeepInfra API key not found. Set DEEPINFRA_API_KEY environment variable."
             )
 
-        # Initialize OpenAI client with DeepInfra endpoint
+        # Initialize OpenAI clients with DeepInfra endpoint; the sync client
+        # serves the TTS worker thread, the async one STT on the event loop.
+        # Both keep connections alive between calls, multiplexed over HTTP/2
+        # when the optional h2 package is installed.
+        http2 = find_spec("h2") is not None
         self.client = OpenAI(
             api_key=self.api_key,
             base_url="https://api.deepinfra.com/v1/openai",
+            http_client=DefaultHttpxClient(
+                http2=http2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT
+            ),
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url="https://api.deepinfra.com/v1/openai",
+            http_client=DefaultAsyncHttpxClient(
+                http2=http2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT
+            ),
         )
 
         self.audio_handler = AudioHandler()
@@ -46,8 +89,14 @@ class DeepInfraVoiceService(BaseVoiceService):
         self.tts_model = "ResembleAI/chatterbox-turbo"  # DeepInfra TTS model
         self.default_voice = "tara"  # Default voice for DeepInfra TTS
 
-        # TTS streaming thread management
-        self._start_tts_thread()
+        # Transcriptions keyed by audio content hash, least recently used first
+        self._stt_cache: OrderedDict = OrderedDict()
+        self._stt_cache_lock = threading.Lock()
+
+        # The TTS worker thread is started on the first text_to_speech_stream call.
+        # Each worker gets its own stop event, so a worker still playing a clip
+        # when it is stopped exits afterwards instead of serving the queue.
+        self._tts_stop_event = threading.Event()
 
     def start_voice_recording(
         self, sample_rate: int = 44100, voice_completed_cb: Optional[Callable] = None
@@ -101,53 +150,249 @@ class DeepInfraVoiceService(BaseVoiceService):
         """Check if currently recording."""
         return self.audio_handler.is_recording()
 
-    async def speech_to_text(self, audio_data: Any, sample_rate: int) -> Dict[str, Any]:
+    async def speech_to_text(
+        self, audio_data: Any, sample_rate: int, include_timestamps: bool = False
+    ) -> Dict[str, Any]:
         """
         Convert speech to text using DeepInfra's OpenAI-compatible STT.
 
         Args:
             audio_data: NumPy array of audio data
             sample_rate: Sample rate of the audio
+            include_timestamps: Request the verbose response with segment timestamps
 
         Returns:
-            Dict containing transcription results
+            Dict containing transcription results; with include_timestamps it
+            also holds "segments" timed from the start of the recording
         """
         try:
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                sf.write(tmp_file.name, audio_data, sample_rate)
-                tmp_file_path = tmp_file.name
-
-            # Perform speech-to-text using OpenAI-compatible API
-            with open(tmp_file_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model=self.stt_model,
-                    file=audio_file,
-                    language="en",  # Can be made configurable, supports ISO-639-1 format
-                    response_format="verbose_json",  # Get detailed response with timestamps
-                    temperature=0.2,  # Lower temperature for more focused output
-                    timestamp_granularities=["segment"],  # Get segment-level timestamps
-                )
+            # Dead air (muted mic, accidental push-to-talk) cannot yield text.
+            # The threshold is on the [-1, 1] scale; integer samples are full scale.
+            full_scale = (
+                -float(np.iinfo(audio_data.dtype).min)
+                if np.issubdtype(audio_data.dtype, np.integer)
+                else 1.0
+            )
+            if (
+                len(audio_data) < MIN_SPEECH_SECONDS * sample_rate
+                or np.sqrt(np.mean(np.square(audio_data, dtype=np.float32)))
+                < SILENCE_RMS_THRESHOLD * full_scale
+            ):
+                return {
+                    "success": True,
+                    "text": "",
+                    "language": "en",
+                    "confidence": 0.0,
+                    "words": [],
+                }
+
+            # Hashing a long recording is CPU work; keep it off the event loop
+            cache_key = (
+                await asyncio.to_thread(self._audio_digest, audio_data),
+                sample_rate,
+                self.stt_model,
+                include_timestamps,
+            )
+            with self._stt_cache_lock:
+                cached = self._stt_cache.get(cache_key)
+                if cached is not None:
+                    self._stt_cache.move_to_end(cache_key)
+                    return dict(cached)
+
+            # Segment timestamps are only serialized when explicitly requested
+            timestamp_options = (
+                VERBOSE_TRANSCRIPTION_OPTIONS
+                if include_timestamps
+                else JSON_TRANSCRIPTION_OPTIONS
+            )
 
-            # Clean up temp file
-            os.unlink(tmp_file_path)
+            # Long recordings are split at pauses and transcribed in parallel
+            chunks = self._split_on_silence(audio_data, sample_rate)
+            transcripts = await asyncio.gather(
+                *(
+                    self._transcribe(chunk, sample_rate, timestamp_options)
+                    for chunk in chunks
+                )
+            )
 
-            # Extract information from the response
-            text = transcript.text if hasattr(transcript, "text") else ""
-            language = transcript.language if hasattr(transcript, "language") else "en"
+            # Extract information from the responses, in recording order
+            text = " ".join(
+                transcript.text.strip()
+                for transcript in transcripts
+                if hasattr(transcript, "text")
+            )
+            language = getattr(transcripts[0], "language", "en")
 
-            return {
+            result = {
                 "success": True,
                 "text": text,
                 "language": language,
                 "confidence": 1.0,  # DeepInfra doesn't provide confidence scores in this format
                 "words": [],
             }
+            if include_timestamps:
+                result["segments"] = self._merge_segments(
+                    transcripts, chunks, sample_rate
+                )
+
+            with self._stt_cache_lock:
+                self._stt_cache[cache_key] = result
+                if len(self._stt_cache) > STT_CACHE_SIZE:
+                    self._stt_cache.popitem(last=False)
+
+            return dict(result)
 
         except Exception as e:
             logger.error(f"Speech-to-text failed: {str(e)}")
             return {"success": False, "error": f"Failed to transcribe audio: {str(e)}"}
 
+    async def _transcribe(
+        self, audio_data: Any, sample_rate: int, options: Dict[str, Any]
+    ) -> Any:
+        """
+        Transcribe a single audio chunk using the OpenAI-compatible API.
+
+        Args:
+            audio_data: NumPy array of audio data
+            sample_rate: Sample rate of the audio
+            options: Extra transcription request parameters
+
+        Returns:
+            The transcription response
+        """
+        # Resampling and FLAC encoding block, so they run in a worker thread
+        audio_file = await asyncio.to_thread(
+            self._encode_audio, audio_data, sample_rate
+        )
+        return await self.async_client.audio.transcriptions.create(
+            model=self.stt_model,
+            file=audio_file,
+            language="en",  # Can be made configurable, supports ISO-639-1 format
+            temperature=0.2,  # Lower temperature for more focused output
+            **options,
+        )
+
+    @staticmethod
+    def _audio_digest(audio_data: Any) -> bytes:
+        """Hash the array buffer in place rather than a tobytes() copy."""
+        return hashlib.blake2b(
+            np.ascontiguousarray(audio_data).data, digest_size=16
+        ).digest()
+
+    @staticmethod
+    def _merge_segments(
+        transcripts: List[Any], chunks: List[Any], sample_rate: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Collect verbose segments from per-chunk transcripts, shifting each
+        chunk's timestamps by where that chunk starts in the recording.
+
+        Args:
+            transcripts: Verbose transcription responses, in chunk order
+            chunks: The audio chunks the transcripts were made from
+            sample_rate: Sample rate of the audio
+
+        Returns:
+            List of {"start", "end", "text"} dicts with times in seconds
+        """
+        segments = []
+        offset = 0.0
+        for transcript, chunk in zip(transcripts, chunks):
+            for segment in getattr(transcript, "segments", None) or []:
+                segments.append(
+                    {
+                        "start": segment.start + offset,
+                        "end": segment.end + offset,
+                        "text": segment.text.strip(),
+                    }
+                )
+            offset += len(chunk) / sample_rate
+        return segments
+
+    def _split_on_silence(self, audio_data: Any, sample_rate: int) -> List[Any]:
+        """
+        Split a long recording into chunks of at most STT_CHUNK_SECONDS,
+        cutting at the quietest frame shortly before each limit so words
+        are not split across chunks.
+
+        Args:
+            audio_data: NumPy array of audio data
+            sample_rate: Sample rate of the audio
+
+        Returns:
+            List of audio chunks in recording order
+        """
+        max_samples = int(STT_CHUNK_SECONDS * sample_rate)
+        if len(audio_data) <= max_samples:
+            return [audio_data]
+
+        mono = audio_data if audio_data.ndim == 1 else audio_data.mean(axis=1)
+        frame = max(1, int(SILENCE_FRAME_SECONDS * sample_rate))
+        search = int(SILENCE_SEARCH_SECONDS * sample_rate)
+
+        chunks = []
+        start = 0
+        while len(audio_data) - start > max_samples:
+            window_start = start + max_samples - search
+            window = mono[window_start : start + max_samples]
+            frame_count = len(window) // frame
+            energy = np.square(
+                window[: frame_count * frame].reshape(frame_count, frame)
+            ).mean(axis=1)
+            cut = window_start + int(np.argmin(energy)) * frame + frame // 2
+            chunks.append(audio_data[start:cut])
+            start = cut
+        chunks.append(audio_data[start:])
+        return chunks
+
+    def _encode_audio(self, audio_data: Any, sample_rate: int) -> BytesIO:
+        """
+        Encode audio as 16 kHz mono FLAC in memory for upload.
+
+        Whisper resamples to 16 kHz mono internally, so sending anything
+        richer only costs upload bytes.
+
+        Args:
+            audio_data: NumPy array of audio data
+            sample_rate: Sample rate of the audio
+
+        Returns:
+            BytesIO positioned at the start, named so the SDK picks the MIME type
+        """
+        if np.issubdtype(audio_data.dtype, np.integer) and audio_data.dtype != np.int16:
+            # Other integer widths go through the float path at full scale
+            audio_data = audio_data.astype(np.float32) / -float(
+                np.iinfo(audio_data.dtype).min
+            )
+        # Downmixing and resampling return floats; remember the input scale
+        is_int16 = audio_data.dtype == np.int16
+        if audio_data.ndim == 2:
+            audio_data = audio_data.mean(axis=1)
+        if sample_rate != WHISPER_SAMPLE_RATE:
+            audio_data = signal.resample_poly(
+                audio_data, WHISPER_SAMPLE_RATE, sample_rate
+            )
+        if is_int16:
+            if audio_data.dtype != np.int16:
+                audio_data = np.clip(np.rint(audio_data), -32768, 32767).astype(
+                    np.int16
+                )
+        else:
+            # Quantize once here so libsndfile only copies 2-byte samples
+            audio_data = (np.clip(audio_data, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+        audio_file = BytesIO()
+        sf.write(
+            audio_file,
+            audio_data,
+            WHISPER_SAMPLE_RATE,
+            format="FLAC",
+            subtype="PCM_16",
+        )
+        audio_file.seek(0)
+        audio_file.name = "audio.flac"
+        return audio_file
+
     def clean_text_for_speech(self, text: str) -> str:
         """
         Clean assistant response text for natural speech.
@@ -165,24 +410,33 @@ class DeepInfraVoiceService(BaseVoiceService):
         with self.tts_lock:
             if not self.tts_thread_running:
                 self.tts_thread_running = True
-                self.tts_thread = threading.Thread(target=self._tts_worker, daemon=True)
+                self._tts_stop_event = threading.Event()
+                self.tts_thread = threading.Thread(
+                    target=self._tts_worker, args=(self._tts_stop_event,), daemon=True
+                )
                 self.tts_thread.start()
                 logger.debug("TTS worker thread started (DeepInfra)")
 
-    def _tts_worker(self):
-        """Worker thread for processing TTS requests."""
-        while self.tts_thread_running:
-            try:
-                # Wait for TTS request with timeout
-                tts_request = self.tts_queue.get(timeout=1.0)
-                if tts_request is None:  # Shutdown signal
-                    break
+    def _tts_worker(self, stop_event: threading.Event):
+        """Worker thread for processing TTS requests until stop_event is set."""
+        while not stop_event.is_set():
+            # Block until a request arrives; stop_tts_thread sends None to wake us
+            tts_request = self.tts_queue.get()
+            if stop_event.is_set():  # Shutdown
+                if tts_request is not None:
+                    # Taken from a newer worker's queue; hand it back
+                    try:
+                        self.tts_queue.put_nowait(tts_request)
+                    except queue.Full:
+                        pass
+                break
+            if tts_request is None:
+                # Wake-up meant for a worker that has already stopped
+                continue
 
+            try:
                 text, voice_id, model_id = tts_request
                 self._process_tts_request(text, voice_id, model_id)
-
-            except queue.Empty:
-                continue
             except Exception as e:
                 logger.error(f"TTS worker error: {str(e)}")
 
@@ -267,8 +521,17 @@ class DeepInfraVoiceService(BaseVoiceService):
                 self.tts_queue.put(tts_request, block=False)
                 logger.debug(f"TTS request queued for text: {text[:50]}...")
             except queue.Full:
+                # Drop the oldest request so the queue stays bounded and fresh
+                try:
+                    self.tts_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self.tts_queue.put(tts_request, block=False)
+                except queue.Full:
+                    pass
                 logger.warning(
-                    f"TTS queue is full (size: {self.tts_queue.qsize()}), dropping request"
+                    f"TTS queue is full (size: {self.tts_queue.qsize()}), dropped oldest request"
                 )
         except Exception as e:
             logger.error(f"Failed to queue TTS request: {str(e)}")
@@ -352,30 +615,30 @@ class DeepInfraVoiceService(BaseVoiceService):
         with self.tts_lock:
             if self.tts_thread_running:
                 self.tts_thread_running = False
+                self._tts_stop_event.set()
 
-                # Clear the queue and add shutdown signal
-                try:
-                    while not self.tts_queue.empty():
-                        self.tts_queue.get_nowait()
-                except queue.Empty:
-                    pass
-
-                self.tts_queue.put(None)  # Shutdown signal
+                # Drop pending requests before the wake-up signal, so the
+                # signal itself is never cleared away
+                self.clear_tts_queue()
+                self.tts_queue.put_nowait(None)
 
-                # Wait for thread to finish
+                # A worker still playing a clip exits on its stop event once
+                # the clip ends; only clean up after one that has finished
                 if self.tts_thread and self.tts_thread.is_alive():
-                    self.tts_thread.join(timeout=2.0)
+                    self.tts_thread.join(timeout=TTS_STOP_TIMEOUT)
+                if self.tts_thread is None or not self.tts_thread.is_alive():
+                    self.clear_tts_queue()
 
                 logger.debug("TTS thread stopped")
 
     def clear_tts_queue(self):
         """Clear any pending TTS requests."""
-        try:
-            while not self.tts_queue.empty():
+        while True:
+            try:
                 self.tts_queue.get_nowait()
-            logger.debug("TTS queue cleared")
-        except queue.Empty:
-            pass
+            except queue.Empty:
+                break
+        logger.debug("TTS queue cleared")
 
     def _play_audio_file(self, file_path: Path):
         """
@@ -418,9 +681,21 @@ class DeepInfraVoiceService(BaseVoiceService):
         except Exception as e:
             logger.error(f"Failed to play audio file {file_path}: {e}")
 
+    async def aclose(self) -> None:
+        """Close the async STT client and its pooled connections."""
+        await self.async_client.close()
+
     def __del__(self):
         """Cleanup when service is destroyed."""
         try:
             self.stop_tts_thread()
+            self.client.close()
+            # The async client can only be closed from an event loop
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(self.aclose())
+            else:
+                loop.create_task(self.aclose())
         except Exception:
             pass
@@ -1,5 +1,4 @@
 import os
-import tempfile
 import threading
 from typing import Dict, Any, Optional, Callable
 from io import BytesIO
@@ -110,14 +109,10 @@ class ElevenLabsVoiceService(BaseVoiceService):
             Dict containing transcription results
         """
         try:
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                sf.write(tmp_file.name, audio_data, sample_rate)
-                tmp_file_path = tmp_file.name
-
-            # Convert to BytesIO for API
-            with open(tmp_file_path, "rb") as f:
-                audio_bytes = BytesIO(f.read())
+            # Encode audio in memory for API
+            audio_bytes = BytesIO()
+            sf.write(audio_bytes, audio_data, sample_rate, format="WAV")
+            audio_bytes.seek(0)
 
             # Perform speech-to-text
             transcription = self.client.speech_to_text.convert(
@@ -130,9 +125,6 @@ class ElevenLabsVoiceService(BaseVoiceService):
             if not isinstance(transcription, SpeechToTextChunkResponseModel):
                 raise ValueError("Cannot transribe")
 
-            # Clean up temp file
-            os.unlink(tmp_file_path)
-
             return {
                 "success": True,
                 "text": transcription.text,
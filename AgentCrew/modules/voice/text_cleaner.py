@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from typing import List
 from .base import BaseTextCleaner
 
@@ -55,6 +56,28 @@ class TextCleaner(BaseTextCleaner):
             "Jr.": "Junior",
         }
 
+        # Compile patterns once; the keep-content patterns substitute group 1
+        keep_content = {
+            r"\*\*([^*]+)\*\*",
+            r"\*([^*]+)\*",
+            r"\[([^\]]+)\]\([^)]+\)",
+        }
+        self._compiled_remove = [
+            (
+                re.compile(pattern, re.MULTILINE),
+                r"\1" if pattern in keep_content else "",
+            )
+            for pattern in self.remove_patterns
+        ]
+        self._compiled_replacements = [
+            (re.compile(pattern), replacement)
+            for pattern, replacement in self.replacements
+        ]
+
+        # Streaming TTS cleans the same sentences repeatedly; the transform is
+        # deterministic, so memoize it per instance
+        self._clean_cached = lru_cache(maxsize=1024)(self._clean_for_speech)
+
     def clean_for_speech(self, text: str) -> str:
         """
         Clean text for natural speech synthesis.
@@ -67,22 +90,17 @@ class TextCleaner(BaseTextCleaner):
         """
         if not text:
             return ""
+        return self._clean_cached(text)
 
+    def _clean_for_speech(self, text: str) -> str:
+        """Uncached implementation of clean_for_speech."""
         # Remove code blocks and markdown formatting
-        for pattern in self.remove_patterns:
-            if pattern in [
-                r"\*\*([^*]+)\*\*",
-                r"\*([^*]+)\*",
-                r"\[([^\]]+)\]\([^)]+\)",
-            ]:
-                # Keep the content for these patterns
-                text = re.sub(pattern, r"\1", text, flags=re.MULTILINE)
-            else:
-                text = re.sub(pattern, "", text, flags=re.MULTILINE)
+        for pattern, replacement in self._compiled_remove:
+            text = pattern.sub(replacement, text)
 
         # Apply replacements
-        for pattern, replacement in self.replacements:
-            text = re.sub(pattern, replacement, text)
+        for pattern, replacement in self._compiled_replacements:
+            text = pattern.sub(replacement, text)
 
         # Replace abbreviations
         for abbr, full in self.abbreviations.items():
@@ -2,24 +2,21 @@ import os
 import json
 import time
 import webbrowser
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
 
 import click
-import requests
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 from AgentCrew.modules.config import ConfigManagement
+from AgentCrew.modules.config.config_management import load_json_file_cached
 from AgentCrew.modules.llm.model_registry import ModelRegistry
 from AgentCrew.modules.llm.service_manager import ServiceManager
-from AgentCrew.modules.memory.chroma_service import ChromaMemoryService
-from AgentCrew.modules.memory.context_persistent import ContextPersistenceService
-from AgentCrew.modules.clipboard import ClipboardService
-from AgentCrew.modules.web_search import TavilySearchService
-from AgentCrew.modules.code_analysis import CodeAnalysisService
-from AgentCrew.modules.image_generation import ImageGenerationService
-from AgentCrew.modules.browser_automation import BrowserAutomationService
 from AgentCrew.modules.agents.manager import AgentManager
-from AgentCrew.modules.agents.local_agent import LocalAgent
-from AgentCrew.modules.agents.remote_agent import RemoteAgent
 from AgentCrew.modules.agents.example import (
     DEFAULT_NAME,
     DEFAULT_DESCRIPTION,
@@ -36,6 +33,61 @@ PROVIDER_LIST = [
     "github_copilot",
     "copilot_response",
 ]
+PROVIDER_SET = frozenset(PROVIDER_LIST)
+
+PROVIDER_API_KEY_MAP = {
+    "claude": "ANTHROPIC_API_KEY",
+    "google": "GEMINI_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "deepinfra": "DEEPINFRA_API_KEY",
+    "github_copilot": "GITHUB_COPILOT_API_KEY",
+    "copilot_response": "GITHUB_COPILOT_API_KEY",
+}
+
+# API keys copied from config.json into the environment
+CONFIG_API_KEY_NAMES = (
+    "ANTHROPIC_API_KEY",
+    "GEMINI_API_KEY",
+    "OPENAI_API_KEY",
+    "GROQ_API_KEY",
+    "DEEPINFRA_API_KEY",
+    "GITHUB_COPILOT_API_KEY",
+    "TAVILY_API_KEY",
+    "VOYAGE_API_KEY",
+    "ELEVENLABS_API_KEY",
+)
+
+# Environment keys probed in priority order when no last-used provider applies
+ENV_PROVIDER_ORDER = (
+    ("GITHUB_COPILOT_API_KEY", "github_copilot"),
+    ("ANTHROPIC_API_KEY", "claude"),
+    ("GEMINI_API_KEY", "google"),
+    ("OPENAI_API_KEY", "openai"),
+    ("GROQ_API_KEY", "groq"),
+    ("DEEPINFRA_API_KEY", "deepinfra"),
+)
+
+DEFAULT_AGENTS_CONFIG = f"""
+[[agents]]
+name = "{DEFAULT_NAME}"
+description = "{DEFAULT_DESCRIPTION}"
+system_prompt = '''{DEFAULT_PROMPT}'''
+tools = ["memory", "browser", "web_search", "code_analysis"]
+"""
+
+GITHUB_COPILOT_CLIENT_ID = "Iv1.b507a08c87ecfe98"
+GITHUB_COPILOT_HEADERS = {
+    "accept": "application/json",
+    "editor-version": "vscode/1.100.3",
+    "editor-plugin-version": "GitHub.copilot/1.330.0",
+    "content-type": "application/json",
+    "user-agent": "GithubCopilot/1.330.0",
+    "accept-encoding": "gzip,deflate,br",
+}
+
+SETUP_MAX_WORKERS = 8
+MAX_POLL_INTERVAL = 15
 
 
 class ApplicationSetup:
@@ -43,6 +95,29 @@ class ApplicationSetup:
         self.config_manager = config_manager or ConfigManagement()
         self.services: Optional[Dict[str, Any]] = None
         self.agent_manager: Optional[AgentManager] = None
+        self._global_config_cache: Optional[Dict[str, Any]] = None
+        self._custom_providers_cache: Optional[List[Dict[str, Any]]] = None
+        self._detected_provider: Optional[str] = None
+
+    def _get_global_config(self) -> Dict[str, Any]:
+        """Return the global config, reading it from disk at most once."""
+        if self._global_config_cache is None:
+            self._global_config_cache = self.config_manager.read_global_config_data()
+        return self._global_config_cache
+
+    def _get_custom_providers(self) -> List[Dict[str, Any]]:
+        """Return the custom LLM providers, reading them from disk at most once."""
+        if self._custom_providers_cache is None:
+            self._custom_providers_cache = (
+                self.config_manager.read_custom_llm_providers_config()
+            )
+        return self._custom_providers_cache
+
+    def _invalidate_config_cache(self) -> None:
+        """Drop memoized config data after the global config is written."""
+        self._global_config_cache = None
+        self._custom_providers_cache = None
+        self._detected_provider = None
 
     def load_api_keys_from_config(self) -> None:
         config_file_path = os.getenv("AGENTCREW_CONFIG_PATH")
@@ -51,87 +126,76 @@ class ApplicationSetup:
         config_file_path = os.path.expanduser(config_file_path)
 
         api_keys_config = {}
-        if os.path.exists(config_file_path):
-            try:
-                with open(config_file_path, "r", encoding="utf-8") as f:
-                    loaded_config = json.load(f)
-                    if isinstance(loaded_config, dict) and isinstance(
-                        loaded_config.get("api_keys"), dict
-                    ):
-                        api_keys_config = loaded_config["api_keys"]
-                    else:
-                        click.echo(
-                            f"\u26a0\ufe0f  API keys in {config_file_path} are not in the expected format.",
-                            err=True,
-                        )
-            except json.JSONDecodeError:
-                click.echo(
-                    f"\u26a0\ufe0f  Error decoding API keys from {config_file_path}.",
-                    err=True,
-                )
-            except Exception as e:
+        try:
+            loaded_config = load_json_file_cached(config_file_path)
+            if isinstance(loaded_config, dict) and isinstance(
+                loaded_config.get("api_keys"), dict
+            ):
+                api_keys_config = loaded_config["api_keys"]
+            else:
                 click.echo(
-                    f"\u26a0\ufe0f  Could not load API keys from {config_file_path}: {e}",
+                    f"\u26a0\ufe0f  API keys in {config_file_path} are not in the expected format.",
                     err=True,
                 )
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            click.echo(
+                f"\u26a0\ufe0f  Error decoding API keys from {config_file_path}.",
+                err=True,
+            )
+        except Exception as e:
+            click.echo(
+                f"\u26a0\ufe0f  Could not load API keys from {config_file_path}: {e}",
+                err=True,
+            )
 
-        keys_to_check = [
-            "ANTHROPIC_API_KEY",
-            "GEMINI_API_KEY",
-            "OPENAI_API_KEY",
-            "GROQ_API_KEY",
-            "DEEPINFRA_API_KEY",
-            "GITHUB_COPILOT_API_KEY",
-            "TAVILY_API_KEY",
-            "VOYAGE_API_KEY",
-            "ELEVENLABS_API_KEY",
-        ]
-
-        for key_name in keys_to_check:
-            if key_name in api_keys_config and api_keys_config[key_name]:
-                os.environ[key_name] = str(api_keys_config[key_name]).strip()
+        os.environ.update(
+            {
+                key_name: str(api_keys_config[key_name]).strip()
+                for key_name in CONFIG_API_KEY_NAMES
+                if api_keys_config.get(key_name)
+            }
+        )
+
+    @staticmethod
+    def _safe_init(
+        name: str, factory: Callable[[], Any], errors: Dict[str, Exception]
+    ) -> Any:
+        """Build an optional service, recording any failure in errors under name."""
+        try:
+            return factory()
+        except Exception as e:
+            errors[name] = e
+            return None
 
     def detect_provider(self) -> Optional[str]:
+        if self._detected_provider is None:
+            self._detected_provider = self._detect_provider()
+        return self._detected_provider
+
+    def _detect_provider(self) -> Optional[str]:
+        environ = os.environ
         try:
             last_provider = self.config_manager.get_last_used_provider()
             if last_provider:
-                if last_provider in PROVIDER_LIST:
-                    api_key_map = {
-                        "claude": "ANTHROPIC_API_KEY",
-                        "google": "GEMINI_API_KEY",
-                        "openai": "OPENAI_API_KEY",
-                        "groq": "GROQ_API_KEY",
-                        "deepinfra": "DEEPINFRA_API_KEY",
-                        "github_copilot": "GITHUB_COPILOT_API_KEY",
-                        "copilot_response": "GITHUB_COPILOT_API_KEY",
-                    }
-                    if os.getenv(api_key_map.get(last_provider, "")):
+                if last_provider in PROVIDER_SET:
+                    if environ.get(PROVIDER_API_KEY_MAP[last_provider]):
                         return last_provider
                 else:
-                    custom_providers = (
-                        self.config_manager.read_custom_llm_providers_config()
-                    )
-                    if any(p["name"] == last_provider for p in custom_providers):
+                    custom_providers = self._get_custom_providers()
+                    if last_provider in {p["name"] for p in custom_providers}:
                         return last_provider
         except Exception as e:
             click.echo(f"\u26a0\ufe0f  Could not restore last used provider: {e}")
 
-        if os.getenv("GITHUB_COPILOT_API_KEY"):
-            return "github_copilot"
-        elif os.getenv("ANTHROPIC_API_KEY"):
-            return "claude"
-        elif os.getenv("GEMINI_API_KEY"):
-            return "google"
-        elif os.getenv("OPENAI_API_KEY"):
-            return "openai"
-        elif os.getenv("GROQ_API_KEY"):
-            return "groq"
-        elif os.getenv("DEEPINFRA_API_KEY"):
-            return "deepinfra"
-        else:
-            custom_providers = self.config_manager.read_custom_llm_providers_config()
-            if len(custom_providers) > 0:
-                return custom_providers[0]["name"]
+        for env_key, provider in ENV_PROVIDER_ORDER:
+            if environ.get(env_key):
+                return provider
+
+        custom_providers = self._get_custom_providers()
+        if len(custom_providers) > 0:
+            return custom_providers[0]["name"]
 
         return None
 
@@ -149,97 +213,130 @@ class ApplicationSetup:
         llm_service = llm_manager.get_service(provider)
 
         try:
-            last_model = self.config_manager.get_last_used_model()
-            last_provider = self.config_manager.get_last_used_provider()
-
-            if last_model and last_provider:
-                should_restore = False
-                if provider == last_provider:
-                    should_restore = True
+            last_used = self.config_manager.get_last_used_settings()
+            last_model = last_used.get("model")
 
+            # Only consult the registry when the saved model belongs to this provider
+            if last_model and last_used.get("provider") == provider:
                 last_model_class = registry.get_model(last_model)
-                if should_restore and last_model_class:
+                if last_model_class:
                     llm_service.model = last_model_class.id
         except Exception as e:
             click.echo(f"\u26a0\ufe0f  Could not restore last used model: {e}")
 
-        memory_service = None
-        context_service = None
-        if need_memory:
-            if memory_llm:
-                memory_service = ChromaMemoryService(
-                    llm_service=llm_manager.initialize_standalone_service(memory_llm)
-                )
-            else:
-                memory_service = ChromaMemoryService(
-                    llm_service=llm_manager.initialize_standalone_service(provider)
+        def create_memory_service():
+            from AgentCrew.modules.memory.chroma_service import ChromaMemoryService
+
+            return ChromaMemoryService(
+                llm_service=llm_manager.initialize_standalone_service(
+                    memory_llm or provider
                 )
+            )
 
-            context_service = ContextPersistenceService()
-        clipboard_service = ClipboardService()
+        def create_search_service():
+            from AgentCrew.modules.web_search import TavilySearchService
 
-        try:
-            search_service = TavilySearchService()
-        except Exception as e:
-            click.echo(f"\u26a0\ufe0f Web search tools not available: {str(e)}")
-            search_service = None
+            return TavilySearchService()
+
+        def create_code_analysis_service():
+            from AgentCrew.modules.code_analysis import CodeAnalysisService
 
-        try:
             code_analysis_llm = llm_manager.initialize_standalone_service(provider)
-            code_analysis_service = CodeAnalysisService(llm_service=code_analysis_llm)
-        except Exception as e:
-            click.echo(f"\u26a0\ufe0f Code analysis tool not available: {str(e)}")
-            code_analysis_service = None
+            return CodeAnalysisService(llm_service=code_analysis_llm)
 
-        try:
-            if os.getenv("OPENAI_API_KEY"):
-                image_gen_service = ImageGenerationService()
-            else:
-                image_gen_service = None
-                click.echo(
-                    "\u26a0\ufe0f Image generation service not available: No API keys found."
-                )
-        except Exception as e:
-            click.echo(f"\u26a0\ufe0f Image generation service not available: {str(e)}")
-            image_gen_service = None
+        def create_image_gen_service():
+            if not os.getenv("OPENAI_API_KEY"):
+                raise ValueError("No API keys found.")
 
-        try:
-            browser_automation_service = BrowserAutomationService()
-        except Exception as e:
-            click.echo(
-                f"\u26a0\ufe0f Browser automation service not available: {str(e)}"
-            )
-            browser_automation_service = None
+            from AgentCrew.modules.image_generation import ImageGenerationService
 
-        try:
+            return ImageGenerationService()
+
+        def create_browser_automation_service():
+            from AgentCrew.modules.browser_automation import BrowserAutomationService
+
+            return BrowserAutomationService()
+
+        def create_file_editing_service():
             from AgentCrew.modules.file_editing import FileEditingService
 
-            file_editing_service = FileEditingService()
-        except Exception as e:
-            click.echo(f"\u26a0\ufe0f File editing service not available: {str(e)}")
-            file_editing_service = None
+            return FileEditingService()
 
-        try:
+        def create_command_execution_service():
             from AgentCrew.modules.command_execution import CommandExecutionService
 
-            command_execution_service = CommandExecutionService.get_instance()
-        except Exception as e:
+            return CommandExecutionService.get_instance()
+
+        # Optional services are independent of each other, so construct them
+        # concurrently; a failure only disables that service
+        optional_factories = {
+            "web_search": (create_search_service, "Web search tools not available"),
+            "code_analysis": (
+                create_code_analysis_service,
+                "Code analysis tool not available",
+            ),
+            "image_generation": (
+                create_image_gen_service,
+                "Image generation service not available",
+            ),
+            "browser": (
+                create_browser_automation_service,
+                "Browser automation service not available",
+            ),
+            "file_editing": (
+                create_file_editing_service,
+                "File editing service not available",
+            ),
+            "command_execution": (
+                create_command_execution_service,
+                "Command execution service not available",
+            ),
+        }
+
+        with ThreadPoolExecutor(max_workers=SETUP_MAX_WORKERS) as executor:
+            memory_future = (
+                executor.submit(create_memory_service) if need_memory else None
+            )
+            errors: Dict[str, Exception] = {}
+            futures = {
+                name: executor.submit(self._safe_init, name, factory, errors)
+                for name, (factory, _) in optional_factories.items()
+            }
+
+            from AgentCrew.modules.clipboard import ClipboardService
+
+            context_service = None
+            if need_memory:
+                from AgentCrew.modules.memory.context_persistent import (
+                    ContextPersistenceService,
+                )
+
+                context_service = ContextPersistenceService()
+            clipboard_service = ClipboardService()
+
+            optional_services = {name: f.result() for name, f in futures.items()}
+            memory_service = memory_future.result() if memory_future else None
+
+        if errors:
             click.echo(
-                f"\u26a0\ufe0f Command execution service not available: {str(e)}"
+                "\n".join(
+                    f"\u26a0\ufe0f {warning}: {str(errors[name])}"
+                    for name, (_, warning) in optional_factories.items()
+                    if name in errors
+                )
             )
-            command_execution_service = None
 
         self.services = {
             "llm": llm_service,
             "memory": memory_service,
             "clipboard": clipboard_service,
-            "code_analysis": code_analysis_service,
-            "web_search": search_service,
+            "code_analysis": optional_services["code_analysis"],
+            "web_search": optional_services["web_search"],
             "context_persistent": context_service,
-            "image_generation": image_gen_service,
-            "browser": browser_automation_service,
-            "file_editing": file_editing_service,
-            "command_execution": command_execution_service,
+            "image_generation": optional_services["image_generation"],
+            "browser": optional_services["browser"],
+            "file_editing": optional_services["file_editing"],
+            "command_execution": optional_services["command_execution"],
         }
         return self.services
 
@@ -255,7 +352,7 @@ class ApplicationSetup:
 
         services["agent_manager"] = self.agent_manager
 
-        global_config = self.config_manager.read_global_config_data()
+        global_config = self._get_global_config()
         self.agent_manager.context_shrink_enabled = global_config.get(
             "global_settings", {}
         ).get("auto_context_shrink", True)
@@ -277,29 +374,39 @@ class ApplicationSetup:
                 )
                 os.makedirs(os.path.dirname(config_uri), exist_ok=True)
 
-                default_config = f"""
-[[agents]]
-name = "{DEFAULT_NAME}"
-description = "{DEFAULT_DESCRIPTION}"
-system_prompt = '''{DEFAULT_PROMPT}'''
-tools = ["memory", "browser", "web_search", "code_analysis"]
-"""
-
-                with open(config_uri, "w+", encoding="utf-8") as f:
-                    f.write(default_config)
+                # Write to a sibling temp file so a crash never leaves a truncated config
+                tmp_config_uri = f"{config_uri}.tmp"
+                with open(tmp_config_uri, "w", encoding="utf-8") as f:
+                    f.write(DEFAULT_AGENTS_CONFIG)
+                os.replace(tmp_config_uri, config_uri)
 
                 click.echo(f"Created default agent configuration at {config_uri}")
 
+        from AgentCrew.modules.agents.local_agent import LocalAgent
+        from AgentCrew.modules.agents.remote_agent import RemoteAgent
+
         agent_definitions = AgentManager.load_agents_from_config(config_uri)
 
-        for agent_def in agent_definitions:
-            if agent_def.get("base_url", ""):
-                try:
-                    agent = RemoteAgent(
+        # Remote agents fetch their agent card on construction, so resolve them
+        # in parallel; registration below still follows the config order.
+        remote_defs = [d for d in agent_definitions if d.get("base_url", "")]
+        remote_futures = {}
+        if remote_defs:
+            with ThreadPoolExecutor(
+                max_workers=min(SETUP_MAX_WORKERS, len(remote_defs))
+            ) as executor:
+                for agent_def in remote_defs:
+                    remote_futures[id(agent_def)] = executor.submit(
+                        RemoteAgent,
                         agent_def["name"],
                         agent_def.get("base_url"),
                         headers=agent_def.get("headers", {}),
                     )
+
+        for agent_def in agent_definitions:
+            if agent_def.get("base_url", ""):
+                try:
+                    agent = remote_futures[id(agent_def)].result()
                 except Exception:
                     print("Error: cannot connect to remote agent, skipping...")
                     continue
@@ -358,7 +465,7 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
             click.echo(f"\u26a0\ufe0f  Could not restore last used agent: {e}")
 
         if not initial_agent_selected and self.agent_manager:
-            first_agent_name = list(self.agent_manager.agents.keys())[0]
+            first_agent_name = next(iter(self.agent_manager.agents))
             if not self.agent_manager.select_agent(first_agent_name):
                 available_agents = ", ".join(self.agent_manager.agents.keys())
                 click.echo(
@@ -366,20 +473,27 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
                 )
 
     def login(self) -> bool:
+        # Imported here so regular startup does not pay for requests/urllib3
+        try:
+            import requests
+        except ImportError:
+            click.echo(
+                "\u274c Error: 'requests' package is required for authentication",
+                err=True,
+            )
+            click.echo("Install it with: pip install requests")
+            return False
+
+        # One keep-alive connection to github.com for the whole device flow
+        session = requests.Session()
+        session.headers.update(GITHUB_COPILOT_HEADERS)
+
         try:
             click.echo("\U0001f510 Starting GitHub Copilot authentication...")
 
-            resp = requests.post(
+            resp = session.post(
                 "https://github.com/login/device/code",
-                headers={
-                    "accept": "application/json",
-                    "editor-version": "vscode/1.100.3",
-                    "editor-plugin-version": "GitHub.copilot/1.330.0",
-                    "content-type": "application/json",
-                    "user-agent": "GithubCopilot/1.330.0",
-                    "accept-encoding": "gzip,deflate,br",
-                },
-                data='{"client_id":"Iv1.b507a08c87ecfe98","scope":"read:user"}',
+                json={"client_id": GITHUB_COPILOT_CLIENT_ID, "scope": "read:user"},
             )
 
             if resp.status_code != 200:
@@ -392,6 +506,8 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
             device_code = resp_json.get("device_code")
             user_code = resp_json.get("user_code")
             verification_uri = resp_json.get("verification_uri")
+            # GitHub's minimum polling interval; slow_down responses raise it
+            poll_interval = resp_json.get("interval", 5)
 
             if not all([device_code, user_code, verification_uri]):
                 click.echo("\u274c Invalid response from GitHub", err=True)
@@ -405,22 +521,19 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
             webbrowser.open(verification_uri)
 
             while True:
-                time.sleep(5)
+                time.sleep(poll_interval)
 
-                resp = requests.post(
+                resp = session.post(
                     "https://github.com/login/oauth/access_token",
-                    headers={
-                        "accept": "application/json",
-                        "editor-version": "vscode/1.100.3",
-                        "editor-plugin-version": "GitHub.copilot/1.330.0",
-                        "content-type": "application/json",
-                        "user-agent": "GithubCopilot/1.330.0",
-                        "accept-encoding": "gzip,deflate,br",
+                    json={
+                        "client_id": GITHUB_COPILOT_CLIENT_ID,
+                        "device_code": device_code,
+                        "grant_type": "urn:ietf:params:oauth:grant-type:device_code",
                     },
-                    data=f'{{"client_id":"Iv1.b507a08c87ecfe98","device_code":"{device_code}","grant_type":"urn:ietf:params:oauth:grant-type:device_code"}}',
                 )
 
-                resp_json = resp.json()
+                # Decode the raw body directly; skips requests' charset sniffing
+                resp_json = json_loads(resp.content)
                 access_token = resp_json.get("access_token")
                 error = resp_json.get("error")
 
@@ -430,7 +543,10 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
                 elif error == "authorization_pending":
                     continue
                 elif error == "slow_down":
-                    time.sleep(5)
+                    poll_interval = max(
+                        resp_json.get("interval", 0),
+                        min(poll_interval * 2, MAX_POLL_INTERVAL),
+                    )
                     continue
                 elif error == "expired_token":
                     click.echo(
@@ -451,6 +567,7 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
 
             global_config["api_keys"]["GITHUB_COPILOT_API_KEY"] = access_token
             self.config_manager.write_global_config_data(global_config)
+            self._invalidate_config_cache()
 
             click.echo("\U0001f4be GitHub Copilot API key saved to config file!")
             click.echo(
@@ -458,13 +575,8 @@ tools = ["memory", "browser", "web_search", "code_analysis"]
             )
             return True
 
-        except ImportError:
-            click.echo(
-                "\u274c Error: 'requests' package is required for authentication",
-                err=True,
-            )
-            click.echo("Install it with: pip install requests")
-            return False
         except Exception as e:
             click.echo(f"\u274c Authentication failed: {str(e)}", err=True)
             return False
+        finally:
+            session.close()
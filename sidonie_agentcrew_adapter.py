@@ -11,19 +11,30 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
 import time
-from typing import Any, Dict, List, Literal, Optional, TypedDict
+from collections import Counter, OrderedDict
+from importlib.util import find_spec
+from typing import Any, Dict, List, Literal, Optional, Protocol, Set, Tuple, TypedDict, get_args
 
 import httpx
-from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+try:
+    from orjson import dumps as _json_bytes, loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 logger = logging.getLogger("agentcrew-adapter")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s %(message)s")
@@ -31,16 +42,128 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelna
 INTERNAL_TOKEN = os.getenv("AGENTCREW_INTERNAL_TOKEN", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-haiku-latest")
+# Key the /chat agents need; the LLM router and /chat/stream always call
+# OpenAI, and the router falls back to keywords without OPENAI_API_KEY
+LLM_API_KEY_ENV = "ANTHROPIC_API_KEY" if LLM_PROVIDER == "anthropic" else "OPENAI_API_KEY"
+# Model behind each endpoint's replies, part of the response cache key
+CHAT_MODEL_ID = f"anthropic:{ANTHROPIC_MODEL}" if LLM_PROVIDER == "anthropic" else f"openai:{OPENAI_MODEL}"
+STREAM_MODEL_ID = f"openai:{OPENAI_MODEL}"
 BIND_HOST = os.getenv("AGENTCREW_BIND_HOST", "0.0.0.0")
 BIND_PORT = int(os.getenv("AGENTCREW_PORT", "41241"))
 CREWAI_JUDGE_URL = os.getenv("CREWAI_SERVICE_URL", "http://127.0.0.1:8000")
 CREWAI_INTERNAL_TOKEN = os.getenv("CREWAI_INTERNAL_TOKEN", "")
 USE_CREW_JUDGE = os.getenv("USE_CREW_JUDGE", "true").lower() == "true"
 USE_LLM_ROUTER = os.getenv("USE_LLM_ROUTER", "true").lower() == "true"
+LLM_CACHE_ENABLED = os.getenv("AGENTCREW_LLM_CACHE", "true").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("AGENTCREW_LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("AGENTCREW_LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_REDIS_URL = os.getenv("AGENTCREW_LLM_CACHE_REDIS_URL", "")
+MAX_CONCURRENT_LLM = int(os.getenv("AGENTCREW_MAX_CONCURRENT_LLM", "32"))
+MAX_LLM_QUEUE = int(os.getenv("AGENTCREW_MAX_LLM_QUEUE", "64"))
+JUDGE_CACHE_TTL = float(os.getenv("AGENTCREW_JUDGE_CACHE_TTL", "0.2"))
+# Opt-in: each worker process has its own LLM gate and in-process caches
+WORKERS = int(os.getenv("AGENTCREW_WORKERS", "1"))
+LLM_TIMEOUT = float(os.getenv("AGENTCREW_LLM_TIMEOUT", "30"))
+# Prompts ask for at most 120 words (~160 tokens); this caps a runaway reply
+LLM_MAX_TOKENS = int(os.getenv("AGENTCREW_MAX_TOKENS", "220"))
+LLM_TOP_P = 0.9
+LLM_STOP = ["\n\nUser:", "\n\nSystem:"]
+USE_LANGGRAPH_CHAT = os.getenv("USE_LANGGRAPH_CHAT", "false").lower() == "true"
 
 app = FastAPI(title="Sidonie AgentCrew Adapter", version="1.2.0")
 
 
+# ─────────── HTTP clients ───────────
+
+# Shared pooled clients: one TLS handshake per upstream instead of one per
+# request. HTTP/2 multiplexes concurrent streams when h2 is installed.
+HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+OPENAI_CLIENT: Optional[httpx.AsyncClient] = None
+JUDGE_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def _openai_client() -> httpx.AsyncClient:
+    global OPENAI_CLIENT
+    if OPENAI_CLIENT is None:
+        OPENAI_CLIENT = httpx.AsyncClient(
+            base_url="https://api.openai.com/v1",
+            headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+            http2=find_spec("h2") is not None,
+            limits=HTTP_LIMITS,
+            timeout=HTTP_TIMEOUT,
+        )
+    return OPENAI_CLIENT
+
+
+def _judge_client() -> httpx.AsyncClient:
+    global JUDGE_CLIENT
+    if JUDGE_CLIENT is None:
+        JUDGE_CLIENT = httpx.AsyncClient(
+            base_url=CREWAI_JUDGE_URL.rstrip("/"),
+            limits=HTTP_LIMITS,
+            timeout=httpx.Timeout(15.0, connect=5.0),
+        )
+    return JUDGE_CLIENT
+
+
+class LLMGate:
+    """Bounds concurrent LLM calls and reports how many callers are queued."""
+
+    def __init__(self, limit: int, max_waiting: int):
+        self._semaphore = asyncio.Semaphore(limit)
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+
+    @property
+    def available(self) -> int:
+        return self.limit - self.in_flight
+
+    def overloaded(self) -> bool:
+        return self.in_flight >= self.limit and self.waiting >= self.max_waiting
+
+    async def __aenter__(self) -> "LLMGate":
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+LLM_GATE = LLMGate(MAX_CONCURRENT_LLM, MAX_LLM_QUEUE)
+
+
+@app.on_event("startup")
+async def _open_http_clients() -> None:
+    global _LLM
+    _openai_client()
+    _judge_client()
+    if _LLM is None:
+        _LLM = _build_llm()
+
+
+@app.on_event("shutdown")
+async def _close_http_clients() -> None:
+    global OPENAI_CLIENT, JUDGE_CLIENT, _LLM
+    for client in (OPENAI_CLIENT, JUDGE_CLIENT):
+        if client is not None:
+            await client.aclose()
+    OPENAI_CLIENT = JUDGE_CLIENT = None
+    _LLM = None
+
+
 # ─────────── Models ───────────
 
 class ChatHistoryItem(BaseModel):
@@ -49,16 +172,27 @@ class ChatHistoryItem(BaseModel):
     agentId: Optional[str] = None
 
 
+AgentId = Literal["Accueil", "CoursExpert", "RDVBooker", "BlogLover", "SupportHero"]
+
+# Only the last HISTORY_TURNS items are used; the caps reject oversized payloads at parse time
+MAX_HISTORY_ITEMS = 64
+MAX_MESSAGE_LENGTH = 4096
+
+
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     tenantId: str = Field(..., min_length=1)
-    message: str = Field(..., min_length=1)
-    history: Optional[List[ChatHistoryItem]] = None
+    message: str = Field(..., min_length=1, max_length=MAX_MESSAGE_LENGTH)
+    history: Optional[List[ChatHistoryItem]] = Field(default=None, max_length=MAX_HISTORY_ITEMS)
     userRole: Optional[str] = "anonymous"
     userId: Optional[str] = None
-    previousAgent: Optional[str] = None
+    previousAgent: Optional[AgentId] = None
 
 
 class AgentProfile(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     firstName: str
     icon: str
@@ -83,6 +217,9 @@ AGENTS: Dict[str, AgentProfile] = {
     "SupportHero": AgentProfile(id="SupportHero", firstName="Clovis", icon="\U0001f6e0\ufe0f", color="#FFA500", tone="support"),
 }
 
+# Profiles are static, so serialize them once for SSE meta events
+AGENT_PROFILE_DATA: Dict[str, Dict[str, Any]] = {agent_id: profile.model_dump() for agent_id, profile in AGENTS.items()}
+
 AGENT_FALLBACK_TEXT: Dict[str, str] = {
     "Accueil": "Bienvenue chez Sidonie Nail Academy \U0001f496 Dis-moi ton besoin (formation, RDV, blog ou support) et je t'oriente.",
     "CoursExpert": "Je peux t'expliquer les parcours, tarifs et niveaux de formation \U0001f393 Dis-moi ton objectif.",
@@ -91,6 +228,10 @@ AGENT_FALLBACK_TEXT: Dict[str, str] = {
     "SupportHero": "Je prends ton sujet en charge \U0001f6e0\ufe0f Donne-moi les détails pour qu'on le résolve rapidement.",
 }
 
+# Bare greetings/acknowledgements that open a guest conversation: the agent's
+# fallback text already answers them, so no LLM round-trip is needed
+_TRIVIAL_RE = re.compile(r"^\s*(bonjour|salut|hello|hi|coucou|bonsoir|merci|ok|oui|non)[\s!?.]*$", re.IGNORECASE)
+
 AGENT_EXPERTISE: Dict[str, str] = {
     "Accueil": (
         "Tu es l'hôtesse d'accueil. Identifie le besoin du client et oriente-le vers "
@@ -116,9 +257,81 @@ AGENT_EXPERTISE: Dict[str, str] = {
     ),
 }
 
+# Static system prompts per agent, kept byte-identical across tenants so the
+# provider's automatic prompt caching can reuse the prefix between requests
+_PROMPT_DIRECTIVES = "Réponds en français, concis (max 120 mots), utile, naturel."
+_GUEST_DIRECTIVES = "Mode invité: pas de RAG, pas d'action externe, mais tu peux répondre et orienter."
+
+SYSTEM_PROMPT_USER: Dict[str, str] = {
+    agent_id: (
+        f"Tu es {profile.firstName} ({profile.id}) pour Sidonie Nail Academy. "
+        f"{AGENT_EXPERTISE.get(agent_id, '')} "
+        f"{_PROMPT_DIRECTIVES}"
+    )
+    for agent_id, profile in AGENTS.items()
+}
+SYSTEM_PROMPT_GUEST: Dict[str, str] = {
+    agent_id: f"{prompt} {_GUEST_DIRECTIVES}"
+    for agent_id, prompt in SYSTEM_PROMPT_USER.items()
+}
+
+
+def _system_messages(agent_id: str, tenant_id: str, is_guest: bool, provider: str = "openai") -> List[Dict[str, Any]]:
+    """Static agent prompt first, tenant binding last.
+
+    OpenAI caches matching prefixes automatically, so the two parts are sent as
+    separate system messages. Anthropic only caches up to an explicit
+    cache_control marker and takes a single system prompt, so the parts become
+    content blocks with the marker on the static block.
+    """
+    static_prompt = (SYSTEM_PROMPT_GUEST if is_guest else SYSTEM_PROMPT_USER)[agent_id]
+    tenant_binding = f"Contrainte de sécurité: tu réponds uniquement pour tenant_id={tenant_id}. Aucune donnée cross-tenant."
+    if provider == "anthropic":
+        return [
+            {
+                "role": "system",
+                "content": [
+                    {"type": "text", "text": static_prompt, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": tenant_binding},
+                ],
+            }
+        ]
+    return [
+        {"role": "system", "content": static_prompt},
+        {"role": "system", "content": tenant_binding},
+    ]
+
+
+# Conversation turns given to the agent; older history is never read
+HISTORY_TURNS = 8
+
+
+def _history_tail(items: Optional[List[ChatHistoryItem]]) -> List[Dict[str, str]]:
+    if not items:
+        return []
+    return [{"role": h.role, "content": h.content} for h in items[-HISTORY_TURNS:]]
+
+
+def build_messages(
+    agent_id: str,
+    tenant_id: str,
+    user_role: str,
+    history: List[Dict[str, str]],
+    message: str,
+    provider: str = "openai",
+) -> List[Dict[str, Any]]:
+    """Chat messages for an agent turn, shared by /chat and /chat/stream."""
+    messages = _system_messages(agent_id, tenant_id, user_role == "anonymous", provider)
+    for h in history[-HISTORY_TURNS:]:
+        messages.append({"role": h.get("role", "user"), "content": h.get("content", "")})
+    messages.append({"role": "user", "content": message})
+    return messages
+
 
 # ─────────── Intent routing ───────────
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
 INTENT_TO_AGENT: Dict[str, str] = {
     "support": "SupportHero",
     "rdv": "RDVBooker",
@@ -127,6 +340,9 @@ INTENT_TO_AGENT: Dict[str, str] = {
     "accueil": "Accueil",
 }
 
+# Routing, request validation and the per-agent tables all index AGENTS directly
+assert set(INTENT_TO_AGENT.values()) == set(get_args(AgentId)) == AGENTS.keys()
+
 ROUTER_SYSTEM_PROMPT = """Tu es un routeur d'intentions pour le chatbot Sidonie Nail Academy.
 Classe chaque message utilisateur dans UNE seule catégorie :
 
@@ -159,46 +375,63 @@ ROUTER_FEW_SHOTS: List[Dict[str, str]] = [
     {"role": "assistant", "content": '{"intent": "cours"}'},
 ]
 
+# Identical leading messages on every classification, so OpenAI's automatic
+# prompt caching can reuse the prefix; only history and the message vary
+_ROUTER_PREFIX: List[Dict[str, str]] = [{"role": "system", "content": ROUTER_SYSTEM_PROMPT}, *ROUTER_FEW_SHOTS]
 
-def route_intent(message: str) -> str:
-    """Keyword-based intent router (fallback). Returns agent name."""
-    lowered = message.lower()
-    if any(kw in lowered for kw in [
+
+# Keyword fallback, checked in priority order; matches are plain substrings
+INTENT_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("SupportHero", [
         "litige", "rembours", "plainte", "problème", "probleme",
         "urgent", "réclamation", "reclamation", "arnaque", "inadmissible",
         "inacceptable", "prélevé", "preleve", "prélèvement", "prelevement",
         "facture", "paiement", "payé", "paye", "trop perçu", "erreur de",
         "double", "surcharge", "contestation", "mécontente", "mecontent",
         "scandale", "vol", "escroquer",
-    ]):
-        return "SupportHero"
-    if any(kw in lowered for kw in [
+    ]),
+    ("RDVBooker", [
         "rendez-vous", "rdv", "book", "créneau", "creneau",
         "disponibilit", "horaire", "réserv", "reserv", "planning",
         "prendre un", "calendrier",
-    ]):
-        return "RDVBooker"
-    if any(kw in lowered for kw in [
+    ]),
+    ("BlogLover", [
         "blog", "article", "tuto", "conseil", "astuce",
         "tendance", "inspiration", "nail art",
-    ]):
-        return "BlogLover"
-    if any(kw in lowered for kw in [
+    ]),
+    ("CoursExpert", [
         "formation", "cours", "programme", "certif", "prix",
         "tarif", "galerie", "niveau", "diplôme", "diplome",
         "apprentissage", "inscription",
-    ]):
-        return "CoursExpert"
+    ]),
+]
+
+# One alternation per agent so each intent is a single scan in the regex engine;
+# IGNORECASE matches the original message without building a lowered copy
+_INTENT_PATTERNS: List[Tuple[str, re.Pattern[str]]] = [
+    (agent, re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE))
+    for agent, keywords in INTENT_KEYWORDS
+]
+
+
+def route_intent(message: str) -> str:
+    """Keyword-based intent router (fallback). Returns agent name."""
+    for agent, pattern in _INTENT_PATTERNS:
+        if pattern.search(message):
+            return agent
     return "Accueil"
 
 
+def _cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+
+
 def classify_intent_llm(message: str, history: Optional[List[Dict[str, str]]] = None) -> str:
     """Classify user intent via OpenAI LLM. Returns: support|rdv|blog|cours|accueil."""
     if not OPENAI_API_KEY:
         return "accueil"
 
-    messages: List[Dict[str, str]] = [{"role": "system", "content": ROUTER_SYSTEM_PROMPT}]
-    messages.extend(ROUTER_FEW_SHOTS)
+    messages = list(_ROUTER_PREFIX)
 
     # Include last 3 history messages for context
     if history:
@@ -236,8 +469,8 @@ def classify_intent_llm(message: str, history: Optional[List[Dict[str, str]]] =
 
         content = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
         logger.info(
-            "[llm-router] intent_raw=%r tokens=%d+%d elapsed=%dms",
-            content, prompt_tokens, completion_tokens, elapsed_ms,
+            "[llm-router] intent_raw=%r tokens=%d+%d cached=%d elapsed=%dms",
+            content, prompt_tokens, completion_tokens, _cached_prompt_tokens(usage), elapsed_ms,
         )
 
         parsed = json.loads(content)
@@ -257,13 +490,91 @@ def classify_intent_llm(message: str, history: Optional[List[Dict[str, str]]] =
         return "accueil"
 
 
+def _intent_prefixes(intents: List[str]) -> Dict[str, str]:
+    """Map each two-letter prefix naming exactly one intent to that intent."""
+    counts = Counter(intent[:2] for intent in intents)
+    return {intent[:2]: intent for intent in intents if counts[intent[:2]] == 1}
+
+
+# A partial '{"intent": "xx' is enough to decide when no other intent starts
+# with the same two letters; shared prefixes wait for the full reply
+_INTENT_BY_PREFIX = _intent_prefixes(list(INTENT_TO_AGENT))
+if len(_INTENT_BY_PREFIX) < len(INTENT_TO_AGENT):
+    logger.warning("[llm-router-async] ambiguous intent prefixes — those replies are parsed in full")
+_PARTIAL_INTENT_RE = re.compile(r'"intent"\s*:\s*"([a-z]{2})', re.IGNORECASE)
+
+
+def _intent_from_partial(content: str) -> str:
+    """Intent named by a possibly incomplete router reply, or "" if not yet known."""
+    match = _PARTIAL_INTENT_RE.search(content)
+    if match is None:
+        return ""
+    return _INTENT_BY_PREFIX.get(match.group(1).lower(), "")
+
+
+def _router_cache_key(message: str, history: Optional[List[Dict[str, str]]]) -> str:
+    """Hash of what the router sees: the normalized message and the last 3 turns."""
+    raw = json.dumps(
+        {
+            "msg": _WHITESPACE_RE.sub(" ", message).strip().lower(),
+            "history": [[h.get("role", "user"), h.get("content", "")] for h in (history or [])[-3:]],
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _stream_chunks(resp: httpx.Response):
+    """Parsed chunks of an OpenAI streaming reply, up to [DONE]."""
+    async for line in resp.aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        data = line[6:]
+        if data.strip() == "[DONE]":
+            return
+        yield _json_loads(data)
+
+
+def _log_router_reply(content: str, usage: Dict[str, Any], start: float) -> None:
+    logger.info(
+        "[llm-router-async] intent_raw=%r tokens=%d+%d cached=%d elapsed=%dms",
+        content, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+        _cached_prompt_tokens(usage), int((time.monotonic() - start) * 1000),
+    )
+
+
+# Router replies still being read after their intent was returned
+_ROUTER_DRAINS: Set[asyncio.Task] = set()
+
+
+async def _finish_router_stream(resp: httpx.Response, chunks: Any, content: str, start: float) -> None:
+    """Read a router reply to its end for the usage chunk, then release the connection."""
+    usage: Dict[str, Any] = {}
+    try:
+        async for chunk in chunks:
+            usage = chunk.get("usage") or usage
+            if chunk.get("choices"):
+                content += chunk["choices"][0]["delta"].get("content") or ""
+        _log_router_reply(content, usage, start)
+    except Exception as exc:
+        logger.warning("[llm-router-async] draining reply failed: %s", exc)
+    finally:
+        await resp.aclose()
+
+
 async def classify_intent_llm_async(message: str, history: Optional[List[Dict[str, str]]] = None) -> str:
     """Async version of classify_intent_llm for streaming endpoints."""
     if not OPENAI_API_KEY:
         return "accueil"
 
-    messages: List[Dict[str, str]] = [{"role": "system", "content": ROUTER_SYSTEM_PROMPT}]
-    messages.extend(ROUTER_FEW_SHOTS)
+    cache_key = ""
+    if ROUTER_CACHE is not None:
+        cache_key = _router_cache_key(message, history)
+        cached = await ROUTER_CACHE.get(cache_key)
+        if cached is not None:
+            return cached["intent"]
+
+    messages = list(_ROUTER_PREFIX)
 
     if history:
         for h in history[-3:]:
@@ -272,42 +583,65 @@ async def classify_intent_llm_async(message: str, history: Optional[List[Dict[st
     messages.append({"role": "user", "content": message})
 
     start = time.monotonic()
+    client = _openai_client()
+    resp: Optional[httpx.Response] = None
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
+        content = ""
+        intent = ""
+        usage: Dict[str, Any] = {}
+        # Streamed so the category is known before the reply ends
+        resp = await client.send(
+            client.build_request(
+                "POST",
+                "/chat/completions",
                 json={
                     "model": OPENAI_MODEL,
                     "temperature": 0,
                     "max_tokens": 30,
+                    "stream": True,
+                    "stream_options": {"include_usage": True},
                     "messages": messages,
                 },
-            )
-        elapsed_ms = int((time.monotonic() - start) * 1000)
-
+                timeout=10.0,
+            ),
+            stream=True,
+        )
         if resp.status_code != 200:
             logger.warning("[llm-router-async] OpenAI HTTP %d — fallback keywords", resp.status_code)
             return "accueil"
-
-        data = resp.json()
-        usage = data.get("usage", {})
-        content = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        logger.info(
-            "[llm-router-async] intent_raw=%r tokens=%d+%d elapsed=%dms",
-            content, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), elapsed_ms,
-        )
-
-        parsed = json.loads(content)
-        intent = parsed.get("intent", "accueil").lower().strip()
-        return intent if intent in INTENT_TO_AGENT else "accueil"
+        chunks = _stream_chunks(resp)
+        async for chunk in chunks:
+            usage = chunk.get("usage") or usage
+            delta = chunk["choices"][0]["delta"].get("content") if chunk.get("choices") else None
+            if delta:
+                content += delta
+                intent = _intent_from_partial(content)
+                if intent:
+                    break
+
+        if intent:
+            # Finish reading (usage, [DONE]) off the request path, so the
+            # connection goes back to the pool instead of being dropped
+            drain = asyncio.create_task(_finish_router_stream(resp, chunks, content, start))
+            _ROUTER_DRAINS.add(drain)
+            drain.add_done_callback(_ROUTER_DRAINS.discard)
+            resp = None
+        else:
+            _log_router_reply(content, usage, start)
+            parsed = json.loads(content)
+            intent = parsed.get("intent", "accueil").lower().strip()
+        if intent not in INTENT_TO_AGENT:
+            return "accueil"
+        if cache_key:
+            await ROUTER_CACHE.set(cache_key, {"intent": intent}, LLM_CACHE_TTL)
+        return intent
 
     except Exception as exc:
         logger.warning("[llm-router-async] error: %s — fallback keywords", exc)
         return "accueil"
+    finally:
+        if resp is not None:
+            await resp.aclose()
 
 
 def route_message(message: str, history: Optional[List[Dict[str, str]]] = None) -> str:
@@ -359,6 +693,7 @@ async def route_message_async(message: str, history: Optional[List[Dict[str, str
 
 # ─────────── LangGraph state & nodes ───────────
 
+# Nodes return only the keys they change; LangGraph merges them into the state
 class AgentState(TypedDict):
     tenant_id: str
     user_role: str
@@ -370,97 +705,143 @@ class AgentState(TypedDict):
     response_text: str
 
 
+_HANDOFF_PREFIXES: Dict[Tuple[str, str], str] = {
+    (src, dst): f"Résumé transmis de {AGENTS[src].firstName} vers {AGENTS[dst].firstName}: "
+    for src in AGENTS
+    for dst in AGENTS
+    if src != dst
+}
+
+
 def _build_handoff(previous_agent: str, routed_agent: str, message: str) -> str:
     if previous_agent == routed_agent:
         return ""
-    return f"Résumé transmis de {AGENTS[previous_agent].firstName} vers {AGENTS[routed_agent].firstName}: {message.strip()}"
+    return _HANDOFF_PREFIXES[previous_agent, routed_agent] + message.strip()
+
+
+def _build_llm() -> Optional[Any]:
+    """Chat model shared by every agent node; None when no API key is configured."""
+    if LLM_PROVIDER == "anthropic":
+        if not ANTHROPIC_API_KEY:
+            return None
+        from langchain_anthropic import ChatAnthropic
+
+        return ChatAnthropic(
+            model=ANTHROPIC_MODEL,
+            temperature=0.7,
+            api_key=ANTHROPIC_API_KEY,
+            max_tokens=LLM_MAX_TOKENS,
+            max_retries=2,
+            timeout=LLM_TIMEOUT,
+        )
+    if not OPENAI_API_KEY:
+        return None
+    # The SDK applies its own per-request timeout over the pooled client's, so set it here
+    return ChatOpenAI(
+        model=OPENAI_MODEL,
+        temperature=0.7,
+        openai_api_key=OPENAI_API_KEY,
+        http_async_client=_openai_client(),
+        max_tokens=LLM_MAX_TOKENS,
+        top_p=LLM_TOP_P,
+        stop=LLM_STOP,
+        max_retries=2,
+        timeout=LLM_TIMEOUT,
+    )
 
 
-def _llm() -> ChatOpenAI:
-    return ChatOpenAI(model=OPENAI_MODEL, temperature=0.7, openai_api_key=OPENAI_API_KEY)
+_LLM: Optional[Any] = _build_llm()
 
 
 def _agent_node(agent_id: str):
-    def run(state: AgentState) -> AgentState:
-        profile = AGENTS[agent_id]
-        history_text = "\n".join([f"{h['role']}: {h['content']}" for h in state["history"][-8:]])
-        is_guest = state["user_role"] == "anonymous"
-
-        expertise = AGENT_EXPERTISE.get(agent_id, "")
-        system_prompt = (
-            f"Tu es {profile.firstName} ({profile.id}) pour Sidonie Nail Academy. "
-            f"{expertise} "
-            f"Contrainte de sécurité: tu réponds uniquement pour tenant_id={state['tenant_id']}. "
-            "Aucune donnée cross-tenant. "
-            + ("Mode invité: pas de RAG, pas d'action externe, mais tu peux répondre et orienter. " if is_guest else "")
-            + "Réponds en français, concis (max 120 mots), utile, naturel."
+    async def run(state: AgentState) -> Dict[str, str]:
+        messages = build_messages(
+            agent_id, state["tenant_id"], state["user_role"], state["history"], state["message"], LLM_PROVIDER
         )
 
         try:
-            llm = _llm()
-            response = llm.invoke(
-                [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Contexte: {history_text}\nMessage: {state['message']}"},
-                ]
-            )
+            if LLM_GATE.overloaded():
+                raise RuntimeError("LLM queue full")
+            if _LLM is None:
+                raise RuntimeError("LLM not configured")
+            # Time only the call itself, not the wait for a slot in the gate
+            async with LLM_GATE, asyncio.timeout(LLM_TIMEOUT):
+                response = await _LLM.ainvoke(messages)
             text = str(response.content).strip() if response and response.content else "Je suis là pour t'aider."
         except Exception as exc:
             logger.error("[agent_node:%s] LLM error: %s", agent_id, exc)
             text = AGENT_FALLBACK_TEXT.get(agent_id, "Je suis là pour t'aider.")
 
-        state["response_text"] = text
-        return state
+        return {"response_text": text}
 
     return run
 
 
-def _router_node(state: AgentState) -> AgentState:
+async def _router_node(state: AgentState) -> Dict[str, str]:
     """Route using hybrid LLM + keyword intent detection."""
-    routed = route_message(state["message"], state["history"])
-    state["routed_agent"] = routed
-    state["handoff_summary"] = _build_handoff(state["previous_agent"], routed, state["message"])
+    routed = await route_message_async(state["message"], state["history"])
     logger.info(
         "[router] user_role=%s message=%r → routed=%s (prev=%s)",
         state["user_role"], state["message"][:80], routed, state["previous_agent"],
     )
-    return state
+    return {
+        "routed_agent": routed,
+        "handoff_summary": _build_handoff(state["previous_agent"], routed, state["message"]),
+    }
+
+
+_AGENT_NODES = {agent_id: _agent_node(agent_id) for agent_id in AGENTS}
 
 
 def _next_agent(state: AgentState) -> str:
     return state["routed_agent"]
 
 
-def _build_graph():
+def _build_graph(with_router: bool = True):
+    """Compile the chat graph; without the router, entry dispatches on state["routed_agent"]."""
     graph = StateGraph(AgentState)
-    graph.add_node("router", _router_node)
-    graph.add_node("Accueil", _agent_node("Accueil"))
-    graph.add_node("CoursExpert", _agent_node("CoursExpert"))
-    graph.add_node("RDVBooker", _agent_node("RDVBooker"))
-    graph.add_node("BlogLover", _agent_node("BlogLover"))
-    graph.add_node("SupportHero", _agent_node("SupportHero"))
-
-    graph.set_entry_point("router")
-    graph.add_conditional_edges(
-        "router",
-        _next_agent,
-        {
-            "Accueil": "Accueil",
-            "CoursExpert": "CoursExpert",
-            "RDVBooker": "RDVBooker",
-            "BlogLover": "BlogLover",
-            "SupportHero": "SupportHero",
-        },
-    )
-    graph.add_edge("Accueil", END)
-    graph.add_edge("CoursExpert", END)
-    graph.add_edge("RDVBooker", END)
-    graph.add_edge("BlogLover", END)
-    graph.add_edge("SupportHero", END)
+    routes = {agent_id: agent_id for agent_id in AGENTS}
+    for agent_id in AGENTS:
+        graph.add_node(agent_id, _AGENT_NODES[agent_id])
+        graph.add_edge(agent_id, END)
+
+    if with_router:
+        graph.add_node("router", _router_node)
+        graph.set_entry_point("router")
+        graph.add_conditional_edges("router", _next_agent, routes)
+    else:
+        graph.set_conditional_entry_point(_next_agent, routes)
     return graph.compile()
 
 
-CHAT_GRAPH = _build_graph()
+# Compiled lazily: the request paths call agent nodes directly by default
+_CHAT_GRAPHS: Dict[bool, Any] = {}
+
+
+def chat_graph(with_router: bool = True):
+    """Compiled chat graph; without the router it is the agent step alone, for
+    callers that route first and overlap other work with it."""
+    graph = _CHAT_GRAPHS.get(with_router)
+    if graph is None:
+        graph = _CHAT_GRAPHS[with_router] = _build_graph(with_router)
+    return graph
+
+
+async def _run_agent(state: AgentState) -> AgentState:
+    """Agent step for an already-routed state.
+
+    The graph is a single hop here, so the node is called directly unless
+    USE_LANGGRAPH_CHAT asks for the Pregel runtime.
+    """
+    if USE_LANGGRAPH_CHAT:
+        return await chat_graph(with_router=False).ainvoke(state)
+    return {**state, **await _AGENT_NODES[state["routed_agent"]](state)}
+
+
+# Static bodies for the auth-failure path and the constant health fields,
+# serialized once; /health only formats its counters per probe
+_UNAUTHORIZED_BODY = b'{"detail":"Invalid internal token"}'
+_HEALTH_PREFIX = b'{"status":"healthy","service":"agentcrew-adapter",'
 
 
 @app.middleware("http")
@@ -470,46 +851,55 @@ async def verify_internal_token(request: Request, call_next):
     ):
         token = request.headers.get("X-Internal-Token", "")
         if token != INTERNAL_TOKEN:
-            return JSONResponse(status_code=401, content={"detail": "Invalid internal token"})
+            return Response(content=_UNAUTHORIZED_BODY, status_code=401, media_type="application/json")
     return await call_next(request)
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "agentcrew-adapter"}
+    body = _HEALTH_PREFIX + b'"llm":{"available":%d,"waiting":%d}' % (LLM_GATE.available, LLM_GATE.waiting)
+    if RESPONSE_CACHE is not None:
+        body += b',"cache":{"hits":%d,"misses":%d}' % (RESPONSE_CACHE.hits, RESPONSE_CACHE.misses)
+    return Response(content=body + b"}", media_type="application/json")
 
 
 # ─────────── Judge integration ───────────
 
-async def _invoke_judge(
+# Identical judge queries share one backend call while in flight, and the
+# decision is reused for JUDGE_CACHE_TTL seconds afterwards.
+_JUDGE_INFLIGHT: Dict[str, asyncio.Task] = {}
+_JUDGE_RECENT: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _judge_key(tenant_id: str, from_agent: str, to_agent: str, user_message: str) -> str:
+    raw = f"{tenant_id}|{from_agent}|{to_agent}|{user_message}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _post_judge(
     tenant_id: str,
     from_agent: str,
     to_agent: str,
     user_message: str,
     handoff_summary: str,
 ) -> Dict[str, Any]:
-    """Call CrewAI judge to validate handoff. Returns judge result or auto-approve on failure."""
-    if not USE_CREW_JUDGE:
-        return {"approved": True, "score": 1.0, "feedback": "judge disabled"}
-
     headers: Dict[str, str] = {"Content-Type": "application/json"}
     if CREWAI_INTERNAL_TOKEN:
         headers["X-Internal-Token"] = CREWAI_INTERNAL_TOKEN
     headers["X-Tenant-Id"] = tenant_id
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.post(
-                f"{CREWAI_JUDGE_URL.rstrip('/')}/judge",
-                json={
-                    "tenantId": tenant_id,
-                    "fromAgent": from_agent,
-                    "toAgent": to_agent,
-                    "userMessage": user_message,
-                    "fallbackSummary": handoff_summary,
-                },
-                headers=headers,
-            )
+        resp = await _judge_client().post(
+            "/judge",
+            json={
+                "tenantId": tenant_id,
+                "fromAgent": from_agent,
+                "toAgent": to_agent,
+                "userMessage": user_message,
+                "fallbackSummary": handoff_summary,
+            },
+            headers=headers,
+        )
         if resp.status_code == 200:
             return resp.json()
     except Exception:
@@ -518,27 +908,274 @@ async def _invoke_judge(
     return {"approved": True, "score": 0.8, "feedback": "judge fallback (unreachable)"}
 
 
+def _judge_done(key: str, task: asyncio.Task) -> None:
+    _JUDGE_INFLIGHT.pop(key, None)
+    if JUDGE_CACHE_TTL <= 0 or task.cancelled():
+        return
+    now = time.monotonic()
+    if len(_JUDGE_RECENT) >= 256:
+        for stale in [k for k, (expires, _) in _JUDGE_RECENT.items() if expires <= now]:
+            del _JUDGE_RECENT[stale]
+    _JUDGE_RECENT[key] = (now + JUDGE_CACHE_TTL, task.result())
+
+
+async def _invoke_judge(
+    tenant_id: str,
+    from_agent: str,
+    to_agent: str,
+    user_message: str,
+    handoff_summary: str,
+) -> Dict[str, Any]:
+    """Call CrewAI judge to validate handoff. Returns judge result or auto-approve on failure."""
+    if not USE_CREW_JUDGE:
+        return {"approved": True, "score": 1.0, "feedback": "judge disabled"}
+
+    key = _judge_key(tenant_id, from_agent, to_agent, user_message)
+    recent = _JUDGE_RECENT.get(key)
+    if recent is not None and recent[0] > time.monotonic():
+        return recent[1]
+
+    task = _JUDGE_INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _post_judge(tenant_id, from_agent, to_agent, user_message, handoff_summary)
+        )
+        _JUDGE_INFLIGHT[key] = task
+        task.add_done_callback(lambda t: _judge_done(key, t))
+    # Shielded so one caller disconnecting does not cancel the shared call
+    return await asyncio.shield(task)
+
+
+# ─────────── Response cache ───────────
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[Dict[str, Any]]: ...
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int) -> None: ...
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """Redis-backed cache, shared between adapter workers."""
+
+    KEY_PREFIX = "agentcrew:llm-cache:"
+
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+
+        self._client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(self.KEY_PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        await self._client.set(self.KEY_PREFIX + key, json.dumps(value), ex=ttl)
+
+
+class LLMResponseCache:
+    """Exact-match cache of final agent replies, keyed on everything the LLM sees.
+
+    The current message is compared case- and whitespace-insensitively, so
+    "Prix formation ?" and "prix  formation ?" share an entry.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        tenant_id: str,
+        is_guest: bool,
+        previous_agent: str,
+        message: str,
+        history: List[Dict[str, str]],
+    ) -> str:
+        raw = json.dumps(
+            {
+                "model": model,
+                "tenant": tenant_id,
+                "guest": is_guest,
+                "prev": previous_agent,
+                "msg": _WHITESPACE_RE.sub(" ", message).strip().lower(),
+                "history": [[h["role"], h["content"]] for h in history[-HISTORY_TURNS:]],
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as exc:
+            logger.warning("[cache] get failed: %s", exc)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as exc:
+            logger.warning("[cache] set failed: %s", exc)
+
+
+def _build_response_cache() -> Optional[LLMResponseCache]:
+    if not LLM_CACHE_ENABLED:
+        return None
+    if LLM_CACHE_REDIS_URL:
+        try:
+            return LLMResponseCache(RedisCacheBackend(LLM_CACHE_REDIS_URL), LLM_CACHE_TTL)
+        except ImportError:
+            logger.warning("[cache] redis package not installed — using in-memory cache")
+    return LLMResponseCache(MemoryCacheBackend(LLM_CACHE_MAX_ENTRIES), LLM_CACHE_TTL)
+
+
+RESPONSE_CACHE = _build_response_cache()
+# LLM router decisions; cheap to recompute, so kept per process even with Redis
+ROUTER_CACHE: Optional[MemoryCacheBackend] = MemoryCacheBackend(LLM_CACHE_MAX_ENTRIES) if LLM_CACHE_ENABLED else None
+
+# Replies produced on LLM failure must never be cached
+_UNCACHEABLE_TEXTS = frozenset(AGENT_FALLBACK_TEXT.values()) | {"Je suis là pour t'aider."}
+
+
+# Identical /chat turns (same response cache key) that arrive while one is
+# being answered wait for that answer instead of making their own LLM calls
+_CHAT_INFLIGHT: Dict[str, asyncio.Task] = {}
+
+
+async def _answer_turn(initial_state: AgentState, cache_key: str) -> Dict[str, Any]:
+    """Route, run the agent and judge the handoff; returns a response cache entry."""
+    previous_agent = initial_state["previous_agent"]
+    stay_state: AgentState = {**initial_state, "routed_agent": previous_agent, "handoff_summary": ""}
+    speculative: Optional[asyncio.Task] = None
+    if USE_LLM_ROUTER and route_intent(initial_state["message"]) == previous_agent:
+        # The keywords already point at the current agent, so the turn will
+        # most likely stay: start its answer while the LLM router decides.
+        # It is cancelled if a handoff goes through anyway.
+        speculative = asyncio.create_task(_run_agent(stay_state))
+    try:
+        routed_state: AgentState = {**initial_state, **await _router_node(initial_state)}
+        routed_agent = routed_state["routed_agent"]
+
+        if routed_agent == previous_agent:
+            result = await (speculative if speculative is not None else _run_agent(routed_state))
+        # Judge validation on handoff. The judge only needs the routing
+        # decision, so it runs concurrently with the agent's LLM call.
+        elif USE_CREW_JUDGE:
+            result, judge_result = await asyncio.gather(
+                _run_agent(routed_state),
+                _invoke_judge(
+                    initial_state["tenant_id"],
+                    previous_agent,
+                    routed_agent,
+                    initial_state["message"],
+                    routed_state.get("handoff_summary", ""),
+                ),
+            )
+            if not judge_result.get("approved", True):
+                # The handoff answer came from the rejected agent: answer as
+                # the previous agent, without a handoff
+                logger.info("[judge] handoff %s → %s rejected", previous_agent, routed_agent)
+                routed_agent = previous_agent
+                result = await (speculative if speculative is not None else _run_agent(stay_state))
+        else:
+            result = await _run_agent(routed_state)
+    finally:
+        if speculative is not None and not speculative.done():
+            speculative.cancel()
+
+    turn = {
+        "agent": routed_agent,
+        "handoff": result.get("handoff_summary") or None,
+        "text": result.get("response_text") or "Je suis là pour t'aider.",
+    }
+    if RESPONSE_CACHE is not None and turn["text"] not in _UNCACHEABLE_TEXTS:
+        await RESPONSE_CACHE.set(cache_key, turn)
+    return turn
+
+
+async def _shared_turn(initial_state: AgentState, cache_key: str) -> Dict[str, Any]:
+    if not cache_key:
+        return await _answer_turn(initial_state, cache_key)
+    task = _CHAT_INFLIGHT.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(_answer_turn(initial_state, cache_key))
+        _CHAT_INFLIGHT[cache_key] = task
+        task.add_done_callback(lambda _: _CHAT_INFLIGHT.pop(cache_key, None))
+    # Shielded so one caller disconnecting does not cancel the shared turn
+    return await asyncio.shield(task)
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(payload: ChatRequest, x_tenant_id: Optional[str] = Header(None)):
-    if not OPENAI_API_KEY:
-        raise HTTPException(status_code=503, detail="OPENAI_API_KEY not configured")
+async def chat(payload: ChatRequest, response: Response, x_tenant_id: Optional[str] = Header(None)):
+    # _LLM is built from LLM_PROVIDER's key, and is None without it
+    if _LLM is None:
+        raise HTTPException(status_code=503, detail=f"{LLM_API_KEY_ENV} not configured")
+
+    response.headers["X-Queue-Depth"] = str(LLM_GATE.waiting)
 
     if x_tenant_id and x_tenant_id != payload.tenantId:
         raise HTTPException(status_code=403, detail="Tenant ID mismatch")
 
-    if payload.previousAgent and payload.previousAgent in AGENTS:
-        previous_agent = payload.previousAgent
-    else:
-        previous_agent = "Accueil"
+    previous_agent = payload.previousAgent or "Accueil"
 
-    history = [
-        {"role": h.role, "content": h.content, "agentId": h.agentId or ""}
-        for h in (payload.history or [])
-    ]
+    history = _history_tail(payload.history)
+
+    user_role = payload.userRole or "anonymous"
+    if not history and user_role == "anonymous" and _TRIVIAL_RE.match(payload.message):
+        routed = route_intent(payload.message)
+        return ChatResponse(tenantId=payload.tenantId, agent=AGENTS[routed], handoff=None, text=AGENT_FALLBACK_TEXT[routed])
+
+    cache_key = ""
+    if RESPONSE_CACHE is not None:
+        cache_key = LLMResponseCache.make_key(
+            CHAT_MODEL_ID, payload.tenantId, user_role == "anonymous", previous_agent, payload.message, history
+        )
+        cached = await RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return ChatResponse(
+                tenantId=payload.tenantId,
+                agent=AGENTS[cached["agent"]],
+                handoff=cached.get("handoff"),
+                text=cached["text"],
+            )
 
     initial_state: AgentState = {
         "tenant_id": payload.tenantId,
-        "user_role": payload.userRole or "anonymous",
+        "user_role": user_role,
         "message": payload.message,
         "history": history,
         "previous_agent": previous_agent,
@@ -548,26 +1185,12 @@ async def chat(payload: ChatRequest, x_tenant_id: Optional[str] = Header(None)):
     }
 
     try:
-        result = CHAT_GRAPH.invoke(initial_state)
-        routed_agent = result["routed_agent"]
-
-        # Judge validation on handoff
-        if routed_agent != previous_agent and USE_CREW_JUDGE:
-            judge_result = await _invoke_judge(
-                payload.tenantId,
-                previous_agent,
-                routed_agent,
-                payload.message,
-                result.get("handoff_summary", ""),
-            )
-            if not judge_result.get("approved", True):
-                routed_agent = previous_agent
-
+        turn = await _shared_turn(initial_state, cache_key)
         return ChatResponse(
             tenantId=payload.tenantId,
-            agent=AGENTS[routed_agent],
-            handoff=result.get("handoff_summary") or None,
-            text=result.get("response_text") or "Je suis là pour t'aider.",
+            agent=AGENTS[turn["agent"]],
+            handoff=turn["handoff"],
+            text=turn["text"],
         )
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"AgentCrew adapter error: {exc}")
@@ -575,98 +1198,201 @@ async def chat(payload: ChatRequest, x_tenant_id: Optional[str] = Header(None)):
 
 # ─────────── SSE Streaming endpoint ───────────
 
+SSE_HEADERS: Dict[str, str] = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+
+def _sse(obj: Dict[str, Any]) -> bytes:
+    return _SSE_PREFIX + _json_bytes(obj) + _SSE_SUFFIX
+
+
+_DONE_FRAME = _sse({"type": "done"})
+_ERROR_FRAME = _sse({"type": "chunk", "content": "Désolée, une erreur est survenue \U0001f64f"})
+_META_FRAMES: Dict[str, bytes] = {
+    agent_id: _sse({"type": "meta", "agent": data, "handoff": None}) for agent_id, data in AGENT_PROFILE_DATA.items()
+}
+
+
+def _meta_frame(agent_id: str, handoff: Optional[str]) -> bytes:
+    if handoff is None:
+        return _META_FRAMES[agent_id]
+    return _sse({"type": "meta", "agent": AGENT_PROFILE_DATA[agent_id], "handoff": handoff})
+
+
+_FALLBACK_FRAMES: Dict[str, bytes] = {
+    agent_id: _sse({"type": "chunk", "content": text}) for agent_id, text in AGENT_FALLBACK_TEXT.items()
+}
+
+
 @app.post("/chat/stream")
 async def chat_stream(payload: ChatRequest, x_tenant_id: Optional[str] = Header(None)):
-    """SSE streaming version of /chat. Uses async LLM router for intent detection."""
+    """SSE streaming version of /chat. Uses async LLM router for intent detection.
+
+    Replies stream from the OpenAI API whatever LLM_PROVIDER is, so this
+    endpoint needs OPENAI_API_KEY even when /chat runs on Anthropic.
+    """
     if not OPENAI_API_KEY:
         raise HTTPException(status_code=503, detail="OPENAI_API_KEY not configured")
 
-    if x_tenant_id and x_tenant_id != payload.tenantId:
+    # Bind request fields once; the generator below only closes over locals
+    tenant_id = payload.tenantId
+    user_message = payload.message
+    user_role = payload.userRole or "anonymous"
+
+    if x_tenant_id and x_tenant_id != tenant_id:
         raise HTTPException(status_code=403, detail="Tenant ID mismatch")
 
-    if payload.previousAgent and payload.previousAgent in AGENTS:
-        previous_agent = payload.previousAgent
-    else:
-        previous_agent = "Accueil"
+    previous_agent = payload.previousAgent or "Accueil"
 
-    history = [
-        {"role": h.role, "content": h.content, "agentId": h.agentId or ""}
-        for h in (payload.history or [])
-    ]
+    history = _history_tail(payload.history)
 
-    routed = await route_message_async(payload.message, history)
-    agent_profile = AGENTS.get(routed, AGENTS["Accueil"])
-    logger.info("[stream] user_role=%s routed=%s", payload.userRole, routed)
+    if not history and user_role == "anonymous" and _TRIVIAL_RE.match(user_message):
+        routed = route_intent(user_message)
+        trivial_reply = _META_FRAMES[routed] + _FALLBACK_FRAMES[routed] + _DONE_FRAME
 
-    async def generate():
-        yield f"data: {json.dumps({'type': 'meta', 'agent': agent_profile.model_dump(), 'handoff': None})}\n\n"
-
-        is_guest = (payload.userRole or "anonymous") == "anonymous"
-        expertise = AGENT_EXPERTISE.get(routed, "")
-        system_prompt = (
-            f"Tu es {agent_profile.firstName} ({agent_profile.id}) pour Sidonie Nail Academy. "
-            f"{expertise} "
-            f"Contrainte de sécurité: tu réponds uniquement pour tenant_id={payload.tenantId}. "
-            "Aucune donnée cross-tenant. "
-            + ("Mode invité: pas de RAG, pas d'action externe, mais tu peux répondre et orienter. " if is_guest else "")
-            + "Réponds en français, concis (max 120 mots), naturel et utile."
+        async def reply_trivial():
+            yield trivial_reply
+
+        return StreamingResponse(reply_trivial(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    cache_key = ""
+    if RESPONSE_CACHE is not None:
+        cache_key = LLMResponseCache.make_key(
+            STREAM_MODEL_ID, tenant_id, user_role == "anonymous", previous_agent, user_message, history
         )
+        cached = await RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
 
-        messages = [{"role": "system", "content": system_prompt}]
-        for h in history[-8:]:
-            messages.append({"role": h.get("role", "user"), "content": h.get("content", "")})
-        messages.append({"role": "user", "content": payload.message})
+            async def replay():
+                yield _meta_frame(cached["agent"], cached.get("handoff"))
+                yield _sse({"type": "chunk", "content": cached["text"]})
+                yield _DONE_FRAME
+
+            return StreamingResponse(replay(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    state: AgentState = {
+        "tenant_id": tenant_id,
+        "user_role": user_role,
+        "message": user_message,
+        "history": history,
+        "previous_agent": previous_agent,
+        "routed_agent": "Accueil",
+        "handoff_summary": "",
+        "response_text": "",
+    }
+    routed_state: AgentState = {**state, **await _router_node(state)}
+    routed = routed_state["routed_agent"]
+    agent_profile = AGENTS[routed]
+    handoff = routed_state["handoff_summary"] or None
+
+    async def generate():
+        yield _meta_frame(agent_profile.id, handoff)
+
+        parts: List[str] = []
+        completed = False
+        finish_reason: Optional[str] = None
+        if LLM_GATE.overloaded():
+            logger.warning("[stream] LLM queue full — serving fallback for %s", agent_profile.id)
+            yield _FALLBACK_FRAMES[agent_profile.id]
+            yield _DONE_FRAME
+            return
+
+        # This path streams straight from the OpenAI API, whatever LLM_PROVIDER is
+        messages = build_messages(agent_profile.id, tenant_id, user_role, history, user_message)
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                async with client.stream(
-                    "POST",
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {OPENAI_API_KEY}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": OPENAI_MODEL,
-                        "temperature": 0.7,
-                        "stream": True,
-                        "messages": messages,
-                    },
-                ) as resp:
-                    if resp.status_code != 200:
-                        yield f"data: {json.dumps({'type': 'chunk', 'content': 'Désolée, une erreur est survenue \U0001f64f'})}\n\n"
-                    else:
-                        async for line in resp.aiter_lines():
-                            if not line.startswith("data: "):
+            async with LLM_GATE, _openai_client().stream(
+                "POST",
+                "/chat/completions",
+                json={
+                    "model": OPENAI_MODEL,
+                    "temperature": 0.7,
+                    "top_p": LLM_TOP_P,
+                    "max_tokens": LLM_MAX_TOKENS,
+                    "stop": LLM_STOP,
+                    "stream": True,
+                    "messages": messages,
+                },
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+            ) as resp:
+                if resp.status_code != 200:
+                    yield _ERROR_FRAME
+                else:
+                    # Frame the raw byte stream ourselves: no per-line str decode
+                    buf = bytearray()
+                    finished = timed_out = False
+                    # The read timeout bounds a stalled upstream; the deadline bounds the whole reply
+                    deadline = time.monotonic() + LLM_TIMEOUT
+                    async for raw in resp.aiter_bytes():
+                        if time.monotonic() > deadline:
+                            logger.warning("[stream] %s reply exceeded %.0fs — truncated", agent_profile.id, LLM_TIMEOUT)
+                            timed_out = True
+                            break
+                        buf += raw
+                        while (nl := buf.find(b"\n")) != -1:
+                            line = bytes(buf[:nl]).rstrip(b"\r")
+                            del buf[: nl + 1]
+                            if not line.startswith(b"data: "):
                                 continue
-                            data_str = line[6:]
-                            if data_str.strip() == "[DONE]":
+                            data = line[6:]
+                            if data.strip() == b"[DONE]":
+                                finished = True
                                 break
                             try:
-                                chunk = json.loads(data_str)
-                                delta = chunk.get("choices", [{}])[0].get("delta", {})
-                                content = delta.get("content")
-                                if content:
-                                    yield f"data: {json.dumps({'type': 'chunk', 'content': content})}\n\n"
-                            except (json.JSONDecodeError, IndexError, KeyError):
+                                choice = _json_loads(data)["choices"][0]
+                                content = choice["delta"].get("content")
+                            except (ValueError, IndexError, KeyError, TypeError, AttributeError):
                                 continue
+                            finish_reason = choice.get("finish_reason") or finish_reason
+                            if content:
+                                parts.append(content)
+                                yield _sse({"type": "chunk", "content": content})
+                        if finished:
+                            break
+                    # A reply cut by max_tokens or a content filter is not worth replaying
+                    completed = not timed_out and finish_reason == "stop"
         except Exception:
-            yield f"data: {json.dumps({'type': 'chunk', 'content': 'Désolée, une erreur est survenue \U0001f64f'})}\n\n"
+            yield _ERROR_FRAME
 
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        # This path never asks the judge, so its handoffs must not be replayed
+        # by /chat as if they had been approved
+        cacheable = completed and parts and not (handoff and USE_CREW_JUDGE)
+        if cacheable and RESPONSE_CACHE is not None:
+            await RESPONSE_CACHE.set(cache_key, {"agent": agent_profile.id, "handoff": handoff, "text": "".join(parts)})
+
+        yield _DONE_FRAME
 
     return StreamingResponse(
         generate(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        headers={**SSE_HEADERS, "X-Queue-Depth": str(LLM_GATE.waiting)},
     )
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host=BIND_HOST, port=BIND_PORT, log_level="info")
+    if WORKERS > 1:
+        logger.warning(
+            "[startup] %d workers: up to %d concurrent LLM calls; router cache and request coalescing are per-worker",
+            WORKERS, WORKERS * MAX_CONCURRENT_LLM,
+        )
+        if LLM_CACHE_ENABLED and not LLM_CACHE_REDIS_URL:
+            logger.warning("[startup] %d workers without AGENTCREW_LLM_CACHE_REDIS_URL: response cache is per-worker", WORKERS)
+    # "auto" picks uvloop/httptools when installed (uvicorn[standard]); an
+    # import string is required for workers > 1
+    uvicorn.run(
+        "sidonie_agentcrew_adapter:app",
+        host=BIND_HOST,
+        port=BIND_PORT,
+        loop="auto",
+        http="auto",
+        workers=WORKERS,
+        log_level="info",
+    )
@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from AgentCrew.modules.memory.tool import (
+    get_learn_behaviors_tool_definition,
+    get_learn_behaviors_tool_handler,
+)
+
+
+def _behavior(behavior_id, step, scope="global"):
+    return {
+        "id": behavior_id,
+        "condition": "user asks about code",
+        "action_steps": [step],
+        "scope": scope,
+    }
+
+
+class TestLearnBehaviorsTool(unittest.TestCase):
+    def setUp(self):
+        self.persistence = MagicMock()
+        self.persistence.store_adaptive_behaviors.return_value = True
+        manager = MagicMock()
+        manager.current_agent.name = "Coder"
+        patcher = patch(
+            "AgentCrew.modules.memory.tool.AgentManager.get_instance",
+            return_value=manager,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.handler = get_learn_behaviors_tool_handler(self.persistence)
+
+    def test_definition_names_batch_tool(self):
+        definition = get_learn_behaviors_tool_definition("claude")
+        self.assertEqual(definition["name"], "learn_behaviors")
+        groq = get_learn_behaviors_tool_definition("groq")
+        self.assertEqual(groq["function"]["name"], "learn_behaviors")
+
+    def test_one_write_per_scope(self):
+        result = self.handler(
+            behaviors=[
+                _behavior("style_a", "be brief"),
+                _behavior("style_b", "use examples"),
+                _behavior("project_x", "use uv", scope="project"),
+            ]
+        )
+
+        calls = self.persistence.store_adaptive_behaviors.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0].args[0], "Coder")
+        self.assertEqual(set(calls[0].args[1]), {"style_a", "style_b"})
+        self.assertFalse(calls[0].args[2])
+        self.assertEqual(set(calls[1].args[1]), {"project_x"})
+        self.assertTrue(calls[1].args[2])
+        self.assertEqual(result.count("Stored behavior"), 3)
+
+    def test_duplicate_id_reports_superseded_entry(self):
+        result = self.handler(
+            behaviors=[
+                _behavior("style_a", "be brief"),
+                _behavior("style_a", "be verbose"),
+            ]
+        )
+
+        stored = self.persistence.store_adaptive_behaviors.call_args.args[1]
+        self.assertEqual(stored, {"style_a": "when user asks about code, do be verbose"})
+        lines = result.splitlines()
+        self.assertIn("superseded by entry 2", lines[0])
+        self.assertIn("Stored behavior 'style_a'", lines[1])
+
+    def test_invalid_entry_does_not_block_others(self):
+        result = self.handler(
+            behaviors=[
+                {"id": "broken", "condition": "", "action_steps": ["x"]},
+                _behavior("style_a", "be brief"),
+            ]
+        )
+
+        lines = result.splitlines()
+        self.assertIn("Condition required", lines[0])
+        self.assertIn("Stored behavior 'style_a'", lines[1])
+
+    def test_store_failure_reported_per_entry(self):
+        self.persistence.store_adaptive_behaviors.side_effect = ValueError("bad")
+
+        result = self.handler(behaviors=[_behavior("style_a", "be brief")])
+
+        self.assertIn("Invalid format: bad", result)
+
+    def test_empty_batch(self):
+        self.assertIn("non-empty list", self.handler(behaviors=[]))
+
+
+if __name__ == "__main__":
+    unittest.main()
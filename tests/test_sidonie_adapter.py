@@ -0,0 +1,544 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+
+import sidonie_agentcrew_adapter as adapter
+
+
+def _state(message, previous_agent="Accueil"):
+    return {
+        "tenant_id": "t1",
+        "user_role": "anonymous",
+        "message": message,
+        "history": [],
+        "previous_agent": previous_agent,
+        "routed_agent": "Accueil",
+        "handoff_summary": "",
+        "response_text": "",
+    }
+
+
+class AdapterTestCase(unittest.IsolatedAsyncioTestCase):
+    """Adapter with the LLMs stubbed and caches and the judge off."""
+
+    def setUp(self):
+        self.llm = MagicMock()
+        self.llm.ainvoke = AsyncMock(side_effect=self._reply)
+        self.intent = "accueil"
+        for name, value in {
+            "OPENAI_API_KEY": "test",
+            "USE_LLM_ROUTER": True,
+            "USE_CREW_JUDGE": False,
+            "RESPONSE_CACHE": None,
+            "ROUTER_CACHE": None,
+            "_LLM": self.llm,
+            "classify_intent_llm_async": self._classify,
+        }.items():
+            patcher = patch.object(adapter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _reply(self, messages):
+        await asyncio.sleep(0)
+        return MagicMock(content="réponse")
+
+    async def _classify(self, message, history=None):
+        # Yield like a real HTTP call so concurrent tasks get to run
+        await asyncio.sleep(0)
+        return self.intent
+
+    async def _post_chat(self, message="une formation ?"):
+        transport = httpx.ASGITransport(app=adapter.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/chat", json={"tenantId": "t1", "message": message}
+            )
+
+
+class TestAnswerTurnLLMCalls(AdapterTestCase):
+    async def test_stay_turn_makes_one_call(self):
+        self.intent = "rdv"
+
+        turn = await adapter._answer_turn(_state("un rdv jeudi", "RDVBooker"), "")
+
+        self.assertEqual(turn["agent"], "RDVBooker")
+        self.assertEqual(self.llm.ainvoke.await_count, 1)
+
+    async def test_handoff_turn_makes_one_call(self):
+        self.intent = "rdv"
+
+        turn = await adapter._answer_turn(_state("un rdv jeudi", "CoursExpert"), "")
+
+        self.assertEqual(turn["agent"], "RDVBooker")
+        self.assertEqual(self.llm.ainvoke.await_count, 1)
+
+    async def test_approved_handoff_with_judge_makes_one_call(self):
+        self.intent = "rdv"
+        judge = AsyncMock(return_value={"approved": True})
+
+        with (
+            patch.object(adapter, "USE_CREW_JUDGE", True),
+            patch.object(adapter, "_invoke_judge", judge),
+        ):
+            turn = await adapter._answer_turn(_state("un rdv jeudi", "CoursExpert"), "")
+
+        self.assertEqual(turn["agent"], "RDVBooker")
+        self.assertEqual(self.llm.ainvoke.await_count, 1)
+        judge.assert_awaited_once()
+
+    async def test_rejected_handoff_answers_as_previous_agent(self):
+        self.intent = "rdv"
+        judge = AsyncMock(return_value={"approved": False})
+
+        with (
+            patch.object(adapter, "USE_CREW_JUDGE", True),
+            patch.object(adapter, "_invoke_judge", judge),
+        ):
+            turn = await adapter._answer_turn(_state("un rdv jeudi", "CoursExpert"), "")
+
+        self.assertEqual(turn["agent"], "CoursExpert")
+        self.assertIsNone(turn["handoff"])
+        self.assertEqual(self.llm.ainvoke.await_count, 2)
+
+
+class TestChatProviderKey(AdapterTestCase):
+    async def test_anthropic_provider_does_not_need_openai_key(self):
+        with (
+            patch.object(adapter, "LLM_PROVIDER", "anthropic"),
+            patch.object(adapter, "OPENAI_API_KEY", ""),
+        ):
+            response = await self._post_chat()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["agent"]["id"], "CoursExpert")
+
+    async def test_missing_provider_key_is_503(self):
+        with (
+            patch.object(adapter, "_LLM", None),
+            patch.object(adapter, "LLM_API_KEY_ENV", "ANTHROPIC_API_KEY"),
+        ):
+            response = await self._post_chat()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["detail"], "ANTHROPIC_API_KEY not configured")
+
+
+class TestResponseCache(AdapterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = adapter.LLMResponseCache(adapter.MemoryCacheBackend(16), 60)
+        patcher = patch.object(adapter, "RESPONSE_CACHE", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_normalized_repeat_is_served_from_cache(self):
+        first = await self._post_chat("Une  formation ?")
+        second = await self._post_chat("une formation ?")
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(self.llm.ainvoke.await_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    async def test_fallback_reply_is_not_cached(self):
+        self.llm.ainvoke.side_effect = RuntimeError("upstream down")
+
+        await self._post_chat()
+        response = await self._post_chat()
+
+        self.assertEqual(
+            response.json()["text"], adapter.AGENT_FALLBACK_TEXT["CoursExpert"]
+        )
+        self.assertEqual(self.llm.ainvoke.await_count, 2)
+
+    async def test_identical_concurrent_turns_share_one_answer(self):
+        release = asyncio.Event()
+
+        async def held_reply(messages):
+            await release.wait()
+            return MagicMock(content="réponse")
+
+        self.llm.ainvoke.side_effect = held_reply
+        requests = [asyncio.create_task(self._post_chat()) for _ in range(3)]
+        while not adapter._CHAT_INFLIGHT:
+            await asyncio.sleep(0)
+        release.set()
+        responses = await asyncio.gather(*requests)
+
+        self.assertEqual([r.json()["text"] for r in responses], ["réponse"] * 3)
+        self.assertEqual(self.llm.ainvoke.await_count, 1)
+        self.assertEqual(adapter._CHAT_INFLIGHT, {})
+
+    async def test_memory_backend_evicts_and_expires(self):
+        backend = adapter.MemoryCacheBackend(2)
+        await backend.set("a", {"v": 1}, 60)
+        await backend.set("b", {"v": 2}, 60)
+        await backend.get("a")
+        await backend.set("c", {"v": 3}, 60)
+
+        self.assertEqual(await backend.get("a"), {"v": 1})
+        self.assertIsNone(await backend.get("b"))
+
+        await backend.set("d", {"v": 4}, -1)
+        self.assertIsNone(await backend.get("d"))
+
+
+def _router_stream(*pieces):
+    """OpenAI-style SSE body sending each piece as one content delta."""
+    lines = [
+        b'data: {"choices":[{"delta":{"content":%s}}]}\n\n' % adapter._json_bytes(piece)
+        for piece in pieces
+    ]
+    return lines + [b"data: [DONE]\n\n"]
+
+
+class TestLLMRouter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = 0
+        self.sent = 0
+        usage = (
+            b'data: {"choices":[],"usage":{"prompt_tokens":120,"completion_tokens":6,'
+            b'"prompt_tokens_details":{"cached_tokens":96}}}\n\n'
+        )
+        self.pieces = _router_stream('{"intent": "', "co", 'urs"}')
+        self.pieces.insert(-1, usage)
+        # Lines from this index on wait until the test releases them
+        self.hold_at = len(self.pieces)
+        self.release = asyncio.Event()
+        self.status = 200
+        self.cache = adapter.MemoryCacheBackend(16)
+        client = httpx.AsyncClient(
+            base_url="https://openai.test", transport=httpx.MockTransport(self._handle)
+        )
+        for name, value in {
+            "OPENAI_API_KEY": "test",
+            "OPENAI_CLIENT": client,
+            "ROUTER_CACHE": self.cache,
+        }.items():
+            patcher = patch.object(adapter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _handle(self, request):
+        self.requests += 1
+        self.body = adapter._json_loads(request.content)
+
+        async def body():
+            for index, line in enumerate(self.pieces):
+                if index == self.hold_at:
+                    await self.release.wait()
+                self.sent += 1
+                yield line
+
+        return httpx.Response(self.status, content=body())
+
+    async def test_returns_once_intent_is_known(self):
+        self.hold_at = 2
+
+        intent = await asyncio.wait_for(
+            adapter.classify_intent_llm_async("une formation ?"), 1
+        )
+
+        self.assertEqual(intent, "cours")
+        self.assertEqual(self.sent, 2)
+        self.release.set()
+        await asyncio.gather(*adapter._ROUTER_DRAINS)
+
+    async def test_reads_the_rest_of_the_reply_for_usage(self):
+        with self.assertLogs("agentcrew-adapter", "INFO") as logs:
+            await adapter.classify_intent_llm_async("une formation ?")
+            await asyncio.gather(*adapter._ROUTER_DRAINS)
+
+        self.assertEqual(self.sent, len(self.pieces))
+        self.assertIn("tokens=120+6 cached=96", logs.output[-1])
+        self.assertEqual(adapter._ROUTER_DRAINS, set())
+
+    async def test_requests_usage_in_the_stream(self):
+        await adapter.classify_intent_llm_async("une formation ?")
+        await asyncio.gather(*adapter._ROUTER_DRAINS)
+
+        self.assertEqual(self.body["stream_options"], {"include_usage": True})
+
+    async def test_ambiguous_prefix_falls_back_to_full_parse(self):
+        with patch.object(adapter, "_INTENT_BY_PREFIX", {}):
+            intent = await adapter.classify_intent_llm_async("une formation ?")
+
+        self.assertEqual(intent, "cours")
+        self.assertEqual(self.sent, len(self.pieces))
+
+    async def test_repeat_is_served_from_router_cache(self):
+        await adapter.classify_intent_llm_async("Une formation ?")
+        intent = await adapter.classify_intent_llm_async("une  formation ?")
+
+        self.assertEqual(intent, "cours")
+        self.assertEqual(self.requests, 1)
+
+    async def test_history_is_part_of_the_cache_key(self):
+        await adapter.classify_intent_llm_async("et le prix ?")
+        await adapter.classify_intent_llm_async(
+            "et le prix ?", [{"role": "user", "content": "un rdv"}]
+        )
+
+        self.assertEqual(self.requests, 2)
+
+    async def test_failures_are_not_cached(self):
+        self.status = 500
+
+        self.assertEqual(await adapter.classify_intent_llm_async("bof"), "accueil")
+        self.assertEqual(await adapter.classify_intent_llm_async("bof"), "accueil")
+        self.assertEqual(self.requests, 2)
+
+
+def _completion_stream(*pieces, finish_reason="stop"):
+    """OpenAI-style SSE reply ending with a chunk carrying finish_reason."""
+    final = b'data: {"choices":[{"delta":{},"finish_reason":"%s"}]}\n\n' % (
+        finish_reason.encode()
+    )
+    return _router_stream(*pieces)[:-1] + [final, b"data: [DONE]\n\n"]
+
+
+class TestStreamResponseCache(AdapterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reply = _completion_stream("Bon", "jour")
+        self.cache = adapter.LLMResponseCache(adapter.MemoryCacheBackend(16), 60)
+        client = httpx.AsyncClient(
+            base_url="https://openai.test",
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=b"".join(self.reply))
+            ),
+        )
+        for name, value in {
+            "RESPONSE_CACHE": self.cache,
+            "OPENAI_CLIENT": client,
+        }.items():
+            patcher = patch.object(adapter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _post_stream(self, message, previous_agent="Accueil"):
+        transport = httpx.ASGITransport(app=adapter.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/chat/stream",
+                json={
+                    "tenantId": "t1",
+                    "message": message,
+                    "previousAgent": previous_agent,
+                },
+            )
+
+    async def test_unjudged_stream_handoff_is_not_replayed_by_chat(self):
+        self.intent = "rdv"
+        judge = AsyncMock(return_value={"approved": False})
+
+        with (
+            patch.object(adapter, "USE_CREW_JUDGE", True),
+            patch.object(adapter, "_invoke_judge", judge),
+        ):
+            await self._post_stream("un rdv jeudi")
+            response = await self._post_chat("un rdv jeudi")
+
+        judge.assert_awaited_once()
+        self.assertEqual(response.json()["agent"]["id"], "Accueil")
+
+    async def test_stream_turn_without_handoff_is_shared_with_chat(self):
+        self.intent = "accueil"
+
+        await self._post_stream("parle-moi de vous")
+        response = await self._post_chat("parle-moi de vous")
+
+        self.assertEqual(response.json()["text"], "Bonjour")
+        self.llm.ainvoke.assert_not_awaited()
+
+    async def test_truncated_stream_reply_is_not_cached(self):
+        self.intent = "accueil"
+        self.reply = _completion_stream("Bon", finish_reason="length")
+
+        await self._post_stream("parle-moi de vous")
+        self.reply = _completion_stream("Bon", "jour")
+        response = await self._post_stream("parle-moi de vous")
+
+        self.assertIn('"Bon"', response.text)
+        self.assertIn('"jour"', response.text)
+
+    def test_key_depends_on_the_model(self):
+        keys = {
+            adapter.LLMResponseCache.make_key(
+                model, "t1", True, "Accueil", "prix ?", []
+            )
+            for model in ("openai:gpt-4o-mini", "anthropic:claude-3-5-haiku-latest")
+        }
+
+        self.assertEqual(len(keys), 2)
+
+
+class TestJudgeCoalescing(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = 0
+        self.release = asyncio.Event()
+        client = httpx.AsyncClient(
+            base_url="http://judge.test", transport=httpx.MockTransport(self._handle)
+        )
+        for patcher in (
+            patch.object(adapter, "USE_CREW_JUDGE", True),
+            patch.object(adapter, "JUDGE_CLIENT", client),
+            patch.object(adapter, "JUDGE_CACHE_TTL", 60.0),
+            patch.dict(adapter._JUDGE_RECENT, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _handle(self, request):
+        self.requests += 1
+        await self.release.wait()
+        return httpx.Response(200, json={"approved": False})
+
+    def _judge(self, message="un rdv"):
+        return adapter._invoke_judge("t1", "Accueil", "RDVBooker", message, "")
+
+    async def test_concurrent_queries_share_one_call(self):
+        calls = [asyncio.create_task(self._judge()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        self.release.set()
+        results = await asyncio.gather(*calls)
+
+        self.assertEqual([r["approved"] for r in results], [False] * 3)
+        self.assertEqual(self.requests, 1)
+        self.assertEqual(adapter._JUDGE_INFLIGHT, {})
+
+    async def test_recent_decision_is_reused(self):
+        self.release.set()
+        await self._judge()
+        await self._judge()
+        await self._judge("autre message")
+
+        self.assertEqual(self.requests, 2)
+
+    async def test_cancelled_caller_does_not_cancel_shared_call(self):
+        first = asyncio.create_task(self._judge())
+        second = asyncio.create_task(self._judge())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        self.release.set()
+
+        self.assertFalse((await second)["approved"])
+        self.assertEqual(self.requests, 1)
+
+
+class TestPartialIntent(unittest.TestCase):
+    def test_every_intent_has_a_unique_prefix(self):
+        self.assertEqual(
+            sorted(adapter._INTENT_BY_PREFIX.values()),
+            sorted(adapter.INTENT_TO_AGENT),
+        )
+
+    def test_decides_on_two_letters(self):
+        self.assertEqual(adapter._intent_from_partial('{"intent": "RD'), "rdv")
+        self.assertEqual(adapter._intent_from_partial('{"intent": "c'), "")
+        self.assertEqual(adapter._intent_from_partial('{"int'), "")
+
+    def test_shared_prefixes_are_left_to_the_full_parse(self):
+        prefixes = adapter._intent_prefixes(["support", "suivi", "rdv"])
+
+        self.assertEqual(prefixes, {"rd": "rdv"})
+
+
+class TestHealth(unittest.IsolatedAsyncioTestCase):
+    async def _get_health(self):
+        transport = httpx.ASGITransport(app=adapter.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.get("/health")
+
+    async def test_reports_gate_and_cache_counters(self):
+        cache = MagicMock(hits=3, misses=2)
+        gate = adapter.LLMGate(limit=4, max_waiting=8)
+        with (
+            patch.object(adapter, "RESPONSE_CACHE", cache),
+            patch.object(adapter, "LLM_GATE", gate),
+        ):
+            response = await self._get_health()
+
+        self.assertEqual(
+            response.json(),
+            {
+                "status": "healthy",
+                "service": "agentcrew-adapter",
+                "llm": {"available": 4, "waiting": 0},
+                "cache": {"hits": 3, "misses": 2},
+            },
+        )
+
+    async def test_without_cache(self):
+        with patch.object(adapter, "RESPONSE_CACHE", None):
+            response = await self._get_health()
+
+        self.assertNotIn("cache", response.json())
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+
+class TestLLMGate(unittest.IsolatedAsyncioTestCase):
+    async def test_counts_in_flight_and_waiting(self):
+        gate = adapter.LLMGate(limit=1, max_waiting=1)
+        release = asyncio.Event()
+
+        async def call():
+            async with gate:
+                await release.wait()
+
+        first = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        self.assertEqual((gate.available, gate.waiting), (0, 0))
+        self.assertFalse(gate.overloaded())
+
+        second = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        self.assertEqual((gate.available, gate.waiting), (0, 1))
+        self.assertTrue(gate.overloaded())
+
+        release.set()
+        await asyncio.gather(first, second)
+        self.assertEqual((gate.available, gate.waiting), (1, 0))
+        self.assertFalse(gate.overloaded())
+
+    async def test_release_on_error(self):
+        gate = adapter.LLMGate(limit=2, max_waiting=0)
+
+        with self.assertRaises(RuntimeError):
+            async with gate:
+                raise RuntimeError("boom")
+
+        self.assertEqual(gate.available, 2)
+
+
+class TestAgentNodeTimeout(AdapterTestCase):
+    async def test_queue_wait_not_counted_against_timeout(self):
+        gate = adapter.LLMGate(limit=1, max_waiting=4)
+        node = adapter._agent_node("Accueil")
+
+        async def slow_reply(messages):
+            await asyncio.sleep(0.06)
+            return MagicMock(content="réponse")
+
+        self.llm.ainvoke.side_effect = slow_reply
+        with (
+            patch.object(adapter, "LLM_GATE", gate),
+            patch.object(adapter, "LLM_TIMEOUT", 0.1),
+        ):
+            # The second call waits ~0.06s for the slot, then needs 0.06s more
+            results = await asyncio.gather(
+                node(_state("bonjour")), node(_state("bonjour"))
+            )
+
+        self.assertEqual([r["response_text"] for r in results], ["réponse"] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+import asyncio
+import queue
+import threading
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import soundfile as sf
+
+from AgentCrew.modules.voice.deepinfra_service import DeepInfraVoiceService
+
+
+def _tone(seconds, sample_rate, amplitude=0.5):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+class TestDeepInfraEncodeAudio(unittest.TestCase):
+    def setUp(self):
+        with patch("AgentCrew.modules.voice.deepinfra_service.AudioHandler"):
+            self.service = DeepInfraVoiceService(api_key="test")
+
+    def _decode(self, audio_file):
+        data, sample_rate = sf.read(audio_file, dtype="int16")
+        self.assertEqual(sample_rate, 16000)
+        return data
+
+    def test_int16_resampled_keeps_amplitude(self):
+        audio = (_tone(1.0, 44100) * 32767).astype(np.int16)
+
+        data = self._decode(self.service._encode_audio(audio, 44100))
+
+        self.assertAlmostEqual(np.abs(data).max() / 32767, 0.5, delta=0.02)
+
+    def test_int16_at_whisper_rate_is_unchanged(self):
+        audio = (_tone(1.0, 16000) * 32767).astype(np.int16)
+
+        data = self._decode(self.service._encode_audio(audio, 16000))
+
+        np.testing.assert_array_equal(data, audio)
+
+    def test_float_stereo_downmixed_and_scaled(self):
+        mono = _tone(1.0, 48000)
+        audio = np.stack([mono, mono], axis=1)
+
+        data = self._decode(self.service._encode_audio(audio, 48000))
+
+        self.assertEqual(data.ndim, 1)
+        self.assertAlmostEqual(np.abs(data).max() / 32767, 0.5, delta=0.02)
+
+
+def _segment(start, end, text):
+    segment = MagicMock()
+    segment.start, segment.end, segment.text = start, end, text
+    return segment
+
+
+class TestDeepInfraSpeechToText(unittest.TestCase):
+    def setUp(self):
+        with patch("AgentCrew.modules.voice.deepinfra_service.AudioHandler"):
+            self.service = DeepInfraVoiceService(api_key="test")
+        self.create = AsyncMock()
+        self.service.async_client = MagicMock()
+        self.service.async_client.audio.transcriptions.create = self.create
+
+    def test_timestamps_offset_per_chunk(self):
+        first = MagicMock(text="hello", language="en")
+        first.segments = [_segment(0.0, 1.5, " hello")]
+        second = MagicMock(text="world", language="en")
+        second.segments = [_segment(0.5, 2.0, " world")]
+        chunks = [_tone(30.0, 16000), _tone(10.0, 16000)]
+        # Chunks are encoded concurrently, so answer by chunk, not call order
+        replies = {len(chunks[0]): first, len(chunks[1]): second}
+        self.create.side_effect = lambda **kwargs: replies[len(kwargs["file"])]
+
+        with (
+            patch.object(self.service, "_split_on_silence", return_value=chunks),
+            patch.object(self.service, "_encode_audio", side_effect=lambda a, sr: a),
+        ):
+            result = asyncio.run(
+                self.service.speech_to_text(
+                    np.concatenate(chunks), 16000, include_timestamps=True
+                )
+            )
+
+        self.assertEqual(result["text"], "hello world")
+        self.assertEqual(
+            result["segments"],
+            [
+                {"start": 0.0, "end": 1.5, "text": "hello"},
+                {"start": 30.5, "end": 32.0, "text": "world"},
+            ],
+        )
+        options = self.create.call_args.kwargs
+        self.assertEqual(options["response_format"], "verbose_json")
+
+    def test_no_segments_without_timestamps(self):
+        self.create.return_value = MagicMock(text="hello", language="en")
+
+        result = asyncio.run(self.service.speech_to_text(_tone(1.0, 16000), 16000))
+
+        self.assertNotIn("segments", result)
+        self.assertEqual(self.create.call_args.kwargs["response_format"], "json")
+
+    def test_quiet_int16_audio_skips_the_api(self):
+        rng = np.random.default_rng(0)
+        audio = rng.integers(-10, 10, size=16000, dtype=np.int16)
+
+        result = asyncio.run(self.service.speech_to_text(audio, 16000))
+
+        self.assertEqual(result["text"], "")
+        self.create.assert_not_called()
+
+    def test_repeat_is_served_from_cache(self):
+        self.create.return_value = MagicMock(text="hello", language="en")
+        audio = _tone(1.0, 16000)
+
+        first = asyncio.run(self.service.speech_to_text(audio, 16000))
+        second = asyncio.run(self.service.speech_to_text(audio.copy(), 16000))
+
+        self.assertEqual(first, second)
+        self.create.assert_called_once()
+
+    def test_long_recording_chunks_are_transcribed_concurrently(self):
+        in_flight = []
+        peak = []
+
+        async def transcribe(**kwargs):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            # Each chunk starts 30s later, so its first sample names it
+            text = str(round(float(kwargs["file"][0]) / 30))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return MagicMock(text=text, language="en")
+
+        self.create.side_effect = transcribe
+        audio = (np.arange(70 * 16000) / 16000 + 30).astype(np.float32)
+
+        with patch.object(self.service, "_encode_audio", side_effect=lambda a, sr: a):
+            result = asyncio.run(self.service.speech_to_text(audio, 16000))
+
+        self.assertEqual(self.create.call_count, 3)
+        self.assertEqual(max(peak), 3)
+        self.assertEqual(result["text"], "1 2 3")
+
+    def test_encoding_and_hashing_run_off_the_event_loop(self):
+        self.create.return_value = MagicMock(text="hello", language="en")
+        calls = []
+
+        async def to_thread(func, *args):
+            calls.append(func.__name__)
+            return func(*args)
+
+        with patch(
+            "AgentCrew.modules.voice.deepinfra_service.asyncio.to_thread", to_thread
+        ):
+            asyncio.run(self.service.speech_to_text(_tone(1.0, 16000), 16000))
+
+        self.assertEqual(calls, ["_audio_digest", "_encode_audio"])
+
+
+class TestDeepInfraSplitOnSilence(unittest.TestCase):
+    def setUp(self):
+        with patch("AgentCrew.modules.voice.deepinfra_service.AudioHandler"):
+            self.service = DeepInfraVoiceService(api_key="test")
+
+    def test_short_recording_is_one_chunk(self):
+        audio = _tone(10.0, 16000)
+
+        chunks = self.service._split_on_silence(audio, 16000)
+
+        self.assertEqual(len(chunks), 1)
+        self.assertIs(chunks[0], audio)
+
+    def test_cuts_at_the_pause_before_the_limit(self):
+        audio = _tone(45.0, 16000)
+        audio[27 * 16000 : int(27.5 * 16000)] = 0.0
+
+        chunks = self.service._split_on_silence(audio, 16000)
+
+        self.assertEqual(len(chunks), 2)
+        self.assertGreaterEqual(len(chunks[0]), 27 * 16000)
+        self.assertLessEqual(len(chunks[0]), int(27.5 * 16000))
+        np.testing.assert_array_equal(np.concatenate(chunks), audio)
+
+    def test_stereo_chunks_stay_within_the_limit(self):
+        mono = _tone(100.0, 8000)
+        audio = np.stack([mono, mono], axis=1)
+
+        chunks = self.service._split_on_silence(audio, 8000)
+
+        self.assertTrue(all(len(chunk) <= 30 * 8000 for chunk in chunks))
+        self.assertTrue(all(chunk.ndim == 2 for chunk in chunks))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(audio))
+
+
+class TestDeepInfraTTSQueue(unittest.TestCase):
+    def setUp(self):
+        with patch("AgentCrew.modules.voice.deepinfra_service.AudioHandler"):
+            self.service = DeepInfraVoiceService(api_key="test")
+        # Pretend the worker is running so nothing drains the queue
+        self.service.tts_thread_running = True
+        self.service.tts_queue = queue.Queue(maxsize=2)
+
+    def test_full_queue_drops_the_oldest_request(self):
+        for text in ("one", "two", "three"):
+            self.service.text_to_speech_stream(text)
+
+        queued = [self.service.tts_queue.get_nowait()[0] for _ in range(2)]
+        self.assertEqual(queued, ["two", "three"])
+
+
+class TestDeepInfraTTSWorker(unittest.TestCase):
+    def setUp(self):
+        with patch("AgentCrew.modules.voice.deepinfra_service.AudioHandler"):
+            self.service = DeepInfraVoiceService(api_key="test")
+        self.playing = threading.Event()
+        self.release = threading.Event()
+        self.played = []
+        self.service._process_tts_request = self._play
+        self.addCleanup(self.release.set)
+
+    def _play(self, text, voice_id, model_id):
+        self.played.append((text, threading.current_thread()))
+        if text == "long":
+            self.playing.set()
+            self.release.wait(5)
+
+    def _wait_for(self, count):
+        for _ in range(500):
+            if len(self.played) >= count:
+                return
+            threading.Event().wait(0.01)
+        self.fail(f"only {len(self.played)} clips played")
+
+    def test_stop_during_long_playback_does_not_leave_two_workers(self):
+        self.service.text_to_speech_stream("long")
+        self.assertTrue(self.playing.wait(5))
+        old_worker = self.service.tts_thread
+
+        with patch("AgentCrew.modules.voice.deepinfra_service.TTS_STOP_TIMEOUT", 0.05):
+            self.service.stop_tts_thread()
+        self.assertTrue(old_worker.is_alive())
+
+        self.service.text_to_speech_stream("second")
+        self.service.text_to_speech_stream("third")
+        self.release.set()
+        self._wait_for(3)
+        old_worker.join(2)
+
+        self.assertFalse(old_worker.is_alive())
+        new_worker = self.service.tts_thread
+        self.assertEqual(
+            self.played[1:], [("second", new_worker), ("third", new_worker)]
+        )
+        self.service.stop_tts_thread()
+
+
+class TestDeepInfraShutdown(unittest.TestCase):
+    def setUp(self):
+        with patch("AgentCrew.modules.voice.deepinfra_service.AudioHandler"):
+            self.service = DeepInfraVoiceService(api_key="test")
+        self.service.client = MagicMock()
+        self.service.async_client = MagicMock()
+        self.service.async_client.close = AsyncMock()
+
+    def test_aclose_closes_the_async_client(self):
+        asyncio.run(self.service.aclose())
+
+        self.service.async_client.close.assert_awaited_once()
+
+    def test_teardown_closes_both_clients(self):
+        self.service.__del__()
+
+        self.service.client.close.assert_called_once()
+        self.service.async_client.close.assert_awaited_once()
+
+    def test_teardown_on_a_running_loop_schedules_the_close(self):
+        async def teardown():
+            self.service.__del__()
+            await asyncio.sleep(0)
+
+        asyncio.run(teardown())
+
+        self.service.async_client.close.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()